@@ -1,28 +1,49 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Response
+from typing import List, Optional, Tuple
 from models.document import (
     DocumentCreate, 
     DocumentUpdate, 
     DocumentResponse,
-    DocumentInDB
+    DocumentInDB,
+    IngestionJobResponse
 )
+from core.config import CONTENT_PRIMARY_FIELD, settings
 from core.database import database
 from services.nlp_service import nlp_service
+from services.vector_index import vector_index
+from services.embedding_migration import embed_v2, v2_fields, vector_index_v2
+from services.cache import search_result_cache
+from services.passage_index import copy_passages, index_passages, remove_passages
+from services.ingestion import find_duplicate, ingestion_queue, insert_document
+from services.blob_store import acquire_blob, release_blob
+from services.executors import executors
+from services.file_processor import compute_content_hash
+from services.vector_codec import decode_embedding, embedding_format, encode_embedding
+from services.pagination import SORT_ORDER, encode_cursor, page_query
 from bson import ObjectId
+from pymongo import ReturnDocument
 from datetime import datetime
+import aiofiles
+import hashlib
 import os
-import shutil
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
 UPLOAD_DIR = "uploads"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Embedding fields are internal: never read them back for a response
+RESPONSE_PROJECTION = {
+    "content_embedding": 0, "content_embedding_scale": 0, "content_embedding_offset": 0,
+    "content_embedding_v2": 0, "content_embedding_v2_scale": 0, "content_embedding_v2_offset": 0
+}
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
 @router.get("/debug/count")
 async def debug_document_count():
     """Debug endpoint to check document count and sample data"""
-    collection = database.client.cdl_mvp.documents
+    collection = database.documents
     
     try:
         count = await collection.count_documents({})
@@ -31,14 +52,18 @@ async def debug_document_count():
         sample = await collection.find_one({})
         if sample:
             sample["_id"] = str(sample["_id"])
-            # Remove embedding for readability
-            if "content_embedding" in sample:
-                sample["content_embedding"] = f"Array of {len(sample['content_embedding'])} values"
+            # Remove embeddings for readability
+            for field in ("content_embedding", "content_embedding_v2"):
+                embedding = decode_embedding(sample, field)
+                if embedding is not None:
+                    sample[field] = f"{embedding_format(sample[field])} vector of {len(embedding)} values"
+                    sample.pop(f"{field}_scale", None)
+                    sample.pop(f"{field}_offset", None)
         
         return {
             "total_documents": count,
             "sample_document": sample,
-            "collection_name": "cdl_mvp.documents"
+            "collection_name": f"{settings.DATABASE_NAME}.{settings.COLLECTION_NAME}"
         }
     except Exception as e:
         return {
@@ -50,33 +75,49 @@ async def debug_document_count():
 @router.post("/", response_model=DocumentResponse, status_code=201)
 async def create_document(document: DocumentCreate):
     """Create a new document without file upload"""
-    collection = database.client.cdl_mvp.documents
-    
-    # Generate embedding for content
-    embedding = nlp_service.generate_embedding(document.content)
-    
     document_dict = document.model_dump()
+    document_dict["content_hash"] = compute_content_hash(document.content)
     document_dict["upload_date"] = datetime.utcnow()
-    document_dict["content_embedding"] = embedding
     
-    result = await collection.insert_one(document_dict)
-    
-    created_doc = await collection.find_one({"_id": result.inserted_id})
-    created_doc["_id"] = str(created_doc["_id"])
+    # Reuse the embedding and passages of a document with the same text
+    duplicate = await find_duplicate(database.db, content_hash=document_dict["content_hash"])
+    if duplicate:
+        document_dict["content_embedding"] = decode_embedding(duplicate)
+        document_dict["embedding_model"] = duplicate.get("embedding_model")
+    else:
+        # Generate embedding for content
+        document_dict["content_embedding"] = await nlp_service.embed(document.content, cached=True)
+        document_dict["embedding_model"] = nlp_service.model_id
+    
+    await insert_document(
+        database.db,
+        document_dict,
+        duplicate_of=duplicate["_id"] if duplicate else None
+    )
     
-    return created_doc
+    # insert_one filled in _id, so the response needs no read back
+    return response_document(document_dict)
 
 
-@router.post("/upload", response_model=DocumentResponse, status_code=201)
+def response_document(document_dict: dict) -> dict:
+    """Shape a stored document for a response without the embedding fields"""
+    response = {key: value for key, value in document_dict.items() if key not in RESPONSE_PROJECTION}
+    response["_id"] = str(response["_id"])
+    return response
+
+
+@router.post("/upload", response_model=IngestionJobResponse, status_code=202)
 async def upload_document(
     file: UploadFile = File(...),
     title: str = Form(...),
     authors: str = Form(""),
     tags: str = Form("")
 ):
-    """Upload a document file (PDF, DOCX, TXT) and extract content"""
-    collection = database.client.cdl_mvp.documents
-    
+    """
+    Upload a document file (PDF, DOCX, TXT) for background ingestion
+    Text extraction and embedding run in the ingestion workers; poll
+    GET /documents/jobs/{job_id} for the resulting document
+    """
     # Validate file type
     allowed_extensions = [".pdf", ".docx", ".txt", ".doc"]
     file_ext = os.path.splitext(file.filename)[1].lower()
@@ -87,77 +128,118 @@ async def upload_document(
             detail=f"File type {file_ext} not supported. Allowed: {', '.join(allowed_extensions)}"
         )
     
-    # Save file
-    file_path = os.path.join(UPLOAD_DIR, f"{ObjectId()}_{file.filename}")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Reject oversized uploads before writing anything when the size is known
+    if file.size is not None and file.size > settings.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File exceeds {settings.MAX_UPLOAD_BYTES} bytes")
     
-    # Extract content based on file type
-    try:
-        if file_ext == ".txt":
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-        elif file_ext == ".pdf":
-            from services.file_processor import extract_text_from_pdf
-            content = extract_text_from_pdf(file_path)
-        elif file_ext in [".docx", ".doc"]:
-            from services.file_processor import extract_text_from_docx
-            content = extract_text_from_docx(file_path)
-    except Exception as e:
-        # Clean up file if extraction fails
-        os.remove(file_path)
-        raise HTTPException(status_code=500, detail=f"Failed to extract text: {str(e)}")
+    # Refuse early (429) instead of queueing uploads the workers cannot keep up with
+    ingestion_queue.check_capacity()
     
-    if not content or len(content.strip()) < 10:
-        os.remove(file_path)
-        raise HTTPException(status_code=400, detail="No readable content found in file")
+    # Save file, then file it under its hash so each distinct file is stored once
+    temp_path = os.path.join(UPLOAD_DIR, f"{ObjectId()}.part")
+    file_size, file_sha256 = await save_upload(file, temp_path)
+    file_path = await acquire_blob(database.db, temp_path, file_sha256, file_ext, file_size)
     
     # Parse authors and tags
     authors_list = [a.strip() for a in authors.split(",") if a.strip()] if authors else []
     tags_list = [t.strip() for t in tags.split(",") if t.strip()] if tags else []
     
-    # Generate embedding
-    embedding = nlp_service.generate_embedding(content[:5000])  # Limit to first 5000 chars
-    
-    document_dict = {
+    job = await ingestion_queue.submit(file_path, {
         "title": title,
-        "content": content,
         "authors": authors_list,
         "tags": tags_list,
-        "file_path": file_path,
         "metadata": {
             "original_filename": file.filename,
-            "file_size": os.path.getsize(file_path),
-            "file_type": file_ext
-        },
-        "upload_date": datetime.utcnow(),
-        "content_embedding": embedding
-    }
+            "file_size": file_size,
+            "file_type": file_ext,
+            "file_sha256": file_sha256
+        }
+    })
     
-    result = await collection.insert_one(document_dict)
+    return _job_response(job)
+
+
+async def save_upload(file: UploadFile, file_path: str) -> Tuple[int, str]:
+    """
+    Stream an upload to disk without blocking the event loop
+    Returns the byte count and SHA-256, both computed while writing
+    """
+    digest = hashlib.sha256()
+    size = 0
     
-    created_doc = await collection.find_one({"_id": result.inserted_id})
-    created_doc["_id"] = str(created_doc["_id"])
+    try:
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"File exceeds {settings.MAX_UPLOAD_BYTES} bytes")
+                digest.update(chunk)
+                await buffer.write(chunk)
+    except BaseException:
+        # Don't leave partial files behind (size limit, client disconnect, ...)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    
+    return size, digest.hexdigest()
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_ingestion_job(job_id: str):
+    """Poll the status of a background upload"""
+    try:
+        job = await ingestion_queue.get(ObjectId(job_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid job ID format")
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
     
-    return created_doc
+    return _job_response(job)
+
+
+def _job_response(job: dict) -> dict:
+    return {
+        "_id": str(job["_id"]),
+        "status": job["status"],
+        "document_id": str(job["document_id"]) if job.get("document_id") else None,
+        "error": job.get("error"),
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at")
+    }
 
 
 @router.get("/", response_model=List[DocumentResponse])
-async def get_all_documents(skip: int = 0, limit: int = 50, tags: Optional[str] = None):
-    """Retrieve all documents with optional filtering by tags"""
-    collection = database.client.cdl_mvp.documents
+async def get_all_documents(
+    response: Response,
+    skip: int = Query(0, ge=0, description="Offset paging (slow for deep pages, prefer cursor)"),
+    limit: int = Query(50, ge=1, le=1000),
+    tags: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    excerpt: Optional[int] = Query(None, ge=1, description="Return only the first N characters of content")
+):
+    """
+    Retrieve all documents with optional filtering by tags, newest first
+    The X-Next-Cursor response header holds the cursor for the next page
+    (absent on the last page).
+    """
+    collection = database.documents
     
     try:
         query = {}
         if tags:
             tag_list = [t.strip() for t in tags.split(",")]
             query["tags"] = {"$in": tag_list}
-        
+        query = page_query(query, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
         # Exclude content_embedding from response for performance
         projection = {
             "_id": 1,
             "title": 1,
-            "content": 1,
+            "content": {"$substrCP": ["$content", 0, excerpt]} if excerpt else 1,
             "authors": 1,
             "tags": 1,
             "file_path": 1,
@@ -165,8 +247,13 @@ async def get_all_documents(skip: int = 0, limit: int = 50, tags: Optional[str]
             "upload_date": 1
         }
         
-        cursor = collection.find(query, projection).sort("upload_date", -1).skip(skip).limit(limit)
-        documents = await cursor.to_list(length=limit)
+        find = collection.find(query, projection).sort(SORT_ORDER)
+        if skip and not cursor:
+            find = find.skip(skip)
+        documents = await find.limit(limit).to_list(length=limit)
+        
+        if len(documents) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(documents[-1])
         
         for doc in documents:
             doc["_id"] = str(doc["_id"])
@@ -180,10 +267,10 @@ async def get_all_documents(skip: int = 0, limit: int = 50, tags: Optional[str]
 @router.get("/{document_id}", response_model=DocumentResponse)
 async def get_document(document_id: str):
     """Retrieve a specific document by ID"""
-    collection = database.client.cdl_mvp.documents
+    collection = database.documents
     
     try:
-        doc = await collection.find_one({"_id": ObjectId(document_id)})
+        doc = await collection.find_one({"_id": ObjectId(document_id)}, RESPONSE_PROJECTION)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid document ID format")
     
@@ -197,67 +284,97 @@ async def get_document(document_id: str):
 @router.put("/{document_id}", response_model=DocumentResponse)
 async def update_document(document_id: str, document: DocumentUpdate):
     """Update a document"""
-    collection = database.client.cdl_mvp.documents
+    collection = database.documents
     
     try:
         obj_id = ObjectId(document_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid document ID format")
     
-    # Check if document exists
-    existing = await collection.find_one({"_id": obj_id})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Document not found")
-    
     # Build update dict (only include non-None fields)
     update_data = {k: v for k, v in document.model_dump(exclude_unset=True).items() if v is not None}
     
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
     
-    # If content is updated, regenerate embedding
+    # If content is updated, regenerate embedding (or reuse one for identical text)
+    duplicate = None
+    embedding_v2 = None
     if "content" in update_data:
-        update_data["content_embedding"] = nlp_service.generate_embedding(update_data["content"])
+        update_data["content_hash"] = compute_content_hash(update_data["content"])
+        duplicate = await find_duplicate(database.db, content_hash=update_data["content_hash"])
+        if duplicate and duplicate["_id"] == obj_id:
+            duplicate = None
+        if duplicate:
+            embedding = decode_embedding(duplicate)
+            update_data["embedding_model"] = duplicate.get("embedding_model")
+        else:
+            embedding = await nlp_service.embed(update_data["content"], cached=True)
+            update_data["embedding_model"] = nlp_service.model_id
+        update_data.update(encode_embedding(embedding, settings.EMBEDDING_STORAGE_FORMAT))
+        embedding_v2 = await embed_v2(update_data["content"])
+        if embedding_v2 is not None:
+            update_data.update(v2_fields(embedding_v2))
+    
+    update = {"$set": update_data}
+    if "content" in update_data:
+        # The primary for the old text is gone; new text is reused from wherever find_duplicate finds it
+        update["$unset"] = {CONTENT_PRIMARY_FIELD: ""}
     
-    # Update document
-    await collection.update_one(
+    # Update and read back the new version in one round-trip
+    updated_doc = await collection.find_one_and_update(
         {"_id": obj_id},
-        {"$set": update_data}
+        update,
+        projection=RESPONSE_PROJECTION,
+        return_document=ReturnDocument.AFTER
     )
+    if not updated_doc:
+        raise HTTPException(status_code=404, detail="Document not found")
     
-    # Fetch and return updated document
-    updated_doc = await collection.find_one({"_id": obj_id})
-    updated_doc["_id"] = str(updated_doc["_id"])
+    if "content_embedding" in update_data:
+        vector_index.upsert(str(obj_id), embedding)
+        if embedding_v2 is not None:
+            vector_index_v2.upsert(str(obj_id), embedding_v2)
+        if duplicate:
+            await remove_passages(database.db.chunks, obj_id)
+            await copy_passages(database.db.chunks, duplicate["_id"], obj_id)
+        else:
+            await index_passages(database.db.chunks, obj_id, update_data["content"])
+    search_result_cache.invalidate()
     
+    updated_doc["_id"] = str(updated_doc["_id"])
     return updated_doc
 
 
 @router.delete("/{document_id}", status_code=204)
 async def delete_document(document_id: str):
     """Delete a document"""
-    collection = database.client.cdl_mvp.documents
+    collection = database.documents
     
     try:
         obj_id = ObjectId(document_id)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid document ID format")
     
-    # Check if document exists and get file_path
-    doc = await collection.find_one({"_id": obj_id})
+    # Delete and get back what is needed to release the file in one round-trip
+    doc = await collection.find_one_and_delete({"_id": obj_id}, projection={"file_path": 1, "metadata": 1})
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Delete the physical file if it exists
-    if doc.get("file_path") and os.path.exists(doc["file_path"]):
+    # Release the stored file: shared blobs go away with their last reference,
+    # files from before content-addressed storage are deleted directly
+    file_sha256 = (doc.get("metadata") or {}).get("file_sha256")
+    if file_sha256:
+        await release_blob(database.db, file_sha256)
+    elif doc.get("file_path") and os.path.exists(doc["file_path"]):
         try:
-            os.remove(doc["file_path"])
+            await executors.io.run(os.remove, doc["file_path"], admitted=True)
         except Exception as e:
             print(f"Warning: Could not delete file {doc['file_path']}: {e}")
     
-    # Delete from database
-    result = await collection.delete_one({"_id": obj_id})
-    
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Document not found")
+    vector_index.remove(str(obj_id))
+    vector_index_v2.remove(str(obj_id))
+    await remove_passages(database.db.chunks, obj_id)
+    search_result_cache.invalidate()
     
     return None
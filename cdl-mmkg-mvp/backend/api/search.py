@@ -1,8 +1,18 @@
 from fastapi import APIRouter, Query, HTTPException
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from models.document import DocumentSearchResponse
+from core.config import V1_FIELD, V2_SEARCH_INDEX, settings
 from core.database import database
-from services.nlp_service import nlp_service
+from services.nlp_service import nlp_service, nlp_service_v2
+from services.cache import query_embedding_cache, search_result_cache
+from services.embedding_migration import active_embedding, query_embedding_cache_v2, vector_index_v2
+from services.vector_index import rank_candidates, vector_index
+from services.passage_index import chunk_index, search_passages
+from services.vector_codec import decode_embedding, embedding_projection
+from services.rank_fusion import reciprocal_rank_fusion
+from bson import ObjectId
+from pymongo.errors import OperationFailure
 
 router = APIRouter(prefix="/search", tags=["search"])
 
@@ -10,29 +20,258 @@ router = APIRouter(prefix="/search", tags=["search"])
 @router.get("/", response_model=List[DocumentSearchResponse])
 async def search_documents(
     q: str = Query(..., min_length=1, description="Search query"),
-    limit: int = Query(10, ge=1, le=50, description="Number of results to return")
+    limit: int = Query(10, ge=1, le=50, description="Number of results to return"),
+    vector_weight: float = Query(1.0, ge=0, description="Weight of the semantic ranking in the fusion"),
+    text_weight: float = Query(1.0, ge=0, description="Weight of the keyword ranking in the fusion"),
+    tags: Optional[str] = Query(None, description="Comma-separated tags (any match)"),
+    authors: Optional[str] = Query(None, description="Comma-separated authors (any match)"),
+    file_type: Optional[str] = Query(None, description="Comma-separated file extensions, e.g. pdf,docx"),
+    date_from: Optional[datetime] = Query(None, description="Earliest upload date"),
+    date_to: Optional[datetime] = Query(None, description="Latest upload date")
 ):
     """
-    Semantic search across documents using vector similarity
+    Hybrid search: semantic (vector) and keyword ($text) rankings merged
+    with reciprocal rank fusion. Set a weight to 0 to use only the other ranking.
+    Filters are applied before ranking, so filtered pages stay full.
     Falls back to text search if vector index is not available
     """
-    collection = database.client.cdl_mvp.documents
+    if vector_weight == 0 and text_weight == 0:
+        raise HTTPException(status_code=400, detail="At least one of vector_weight and text_weight must be positive")
     
-    # Generate embedding for the search query
-    query_embedding = nlp_service.generate_embedding(q)
+    filters = build_search_filter(tags, authors, file_type, date_from, date_to)
+    # Read once: the whole request uses one embedding field and its model
+    field = await active_embedding.current(database.db)
     
-    # Try vector search first (requires Atlas vector index)
+    # Serve popular queries without touching MongoDB or the model
+    cache_key = search_result_cache.make_key(q, limit, {
+        "vector_weight": vector_weight,
+        "text_weight": text_weight,
+        "tags": tags,
+        "authors": authors,
+        "file_type": file_type,
+        "date_from": date_from,
+        "date_to": date_to
+    }, uncased=query_cache_for(field).uncased)
+    cached = search_result_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    generation = search_result_cache.current_generation()
+    results = await execute_search(q, limit, vector_weight, text_weight, filters, field)
+    search_result_cache.set(cache_key, generation, results)
+    return results
+
+
+def build_search_filter(
+    tags: Optional[str] = None,
+    authors: Optional[str] = None,
+    file_type: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None
+) -> dict:
+    """
+    MongoDB filter for the search parameters
+    Only uses operators that $vectorSearch pre-filters accept ($in, $gte, $lte).
+    """
+    def split(value: Optional[str]) -> List[str]:
+        return [item.strip() for item in value.split(",") if item.strip()] if value else []
+    
+    filters = {}
+    if split(tags):
+        filters["tags"] = {"$in": split(tags)}
+    if split(authors):
+        filters["authors"] = {"$in": split(authors)}
+    if split(file_type):
+        filters["metadata.file_type"] = {"$in": ["." + ext.lstrip(".").lower() for ext in split(file_type)]}
+    if date_from or date_to:
+        filters["upload_date"] = {}
+        if date_from:
+            filters["upload_date"]["$gte"] = date_from
+        if date_to:
+            filters["upload_date"]["$lte"] = date_to
+    return filters
+
+
+async def matching_document_ids(collection, filters: dict, max_ids: int) -> Optional[List[str]]:
+    """Ids of the documents passing the filters, or None when more than max_ids match"""
+    docs = await collection.find(filters, {"_id": 1}).limit(max_ids + 1).to_list(length=max_ids + 1)
+    if len(docs) > max_ids:
+        return None
+    return [str(doc["_id"]) for doc in docs]
+
+
+async def post_filtered(collection, filters: dict, limit: int, search):
+    """
+    Run search(k) unfiltered and keep the results passing the filters
+    For filters too broad to list their ids: k starts at a multiple of the
+    limit and grows until the page is full or the index is exhausted.
+    """
+    k = limit * settings.SEARCH_POST_FILTER_OVERSAMPLE
+    while True:
+        results = await search(k)
+        if not results:
+            return []
+        cursor = collection.find(
+            {"_id": {"$in": [ObjectId(result["_id"]) for result in results]}, **filters},
+            {"_id": 1}
+        )
+        passing = {str(doc["_id"]) async for doc in cursor}
+        kept = [result for result in results if result["_id"] in passing]
+        if len(kept) >= limit or len(results) < k:
+            return kept[:limit]
+        k *= 4
+
+
+def query_cache_for(field: str):
+    return query_embedding_cache if field == V1_FIELD else query_embedding_cache_v2
+
+
+async def execute_search(
+    q: str,
+    limit: int,
+    vector_weight: float = 1.0,
+    text_weight: float = 1.0,
+    filters: Optional[dict] = None,
+    field: Optional[str] = None
+):
+    """Run the vector and keyword searches (or their fallbacks) for one query"""
+    collection = database.search_documents
+    if field is None:
+        field = await active_embedding.current(database.db)
+    
+    # Fusion needs deeper lists than the page size to find documents both rank well
+    hybrid = vector_weight > 0 and text_weight > 0
+    depth = limit * settings.HYBRID_CANDIDATE_MULTIPLIER if hybrid else limit
+    
+    vector_results = []
+    if vector_weight > 0:
+        # Generate embedding for the search query (repeated queries skip the model)
+        model = nlp_service if field == V1_FIELD else nlp_service_v2
+        query_embedding = await query_cache_for(field).get_or_compute(q, model.embed)
+        vector_results = await vector_search(collection, query_embedding, depth, filters, field)
+    
+    text_results = await keyword_search(collection, q, depth, filters) if text_weight > 0 else None
+    
+    if text_results is None or (not text_results and not vector_results):
+        if vector_results:
+            return vector_results[:limit]
+        if vector_weight == 0:
+            return []
+        return await regex_search(collection, q, query_embedding, limit, filters, field)
+    
+    return fuse_results(vector_results, text_results, vector_weight, text_weight, limit)
+
+
+def fuse_results(vector_results, text_results, vector_weight: float, text_weight: float, limit: int):
+    """Merge the two rankings with reciprocal rank fusion"""
+    # Prefer the vector result's fields: passage search returns the matching passage as content
+    by_id = {result["_id"]: result for result in text_results}
+    by_id.update((result["_id"], result) for result in vector_results)
+    
+    fused = reciprocal_rank_fusion(
+        [
+            (vector_weight, [result["_id"] for result in vector_results]),
+            (text_weight, [result["_id"] for result in text_results])
+        ],
+        k=settings.RRF_K
+    )
+    return [{**by_id[doc_id], "score": score} for doc_id, score in fused[:limit]]
+
+
+async def keyword_search(collection, q: str, limit: int, filters: Optional[dict] = None):
+    """
+    Rank documents with the MongoDB text index (title, authors and tags weigh more)
+    Returns None when the text index does not exist
+    """
     try:
-        pipeline = [
+        cursor = collection.find(
+            {"$text": {"$search": q}, **(filters or {})},
             {
-                "$vectorSearch": {
-                    "index": "vector_index",
-                    "path": "content_embedding",
-                    "queryVector": query_embedding,
-                    "numCandidates": limit * 10,
-                    "limit": limit
-                }
-            },
+                "_id": 1,
+                "title": 1,
+                "content": {"$substr": ["$content", 0, 500]},
+                "authors": 1,
+                "tags": 1,
+                "upload_date": 1,
+                "text_score": {"$meta": "textScore"}
+            }
+        ).sort([("text_score", {"$meta": "textScore"})]).limit(limit)
+        docs = await cursor.to_list(length=limit)
+    except OperationFailure as e:
+        print(f"Text search not available: {e}")
+        return None
+    
+    print(f"Text index returned {len(docs)} results")
+    return [
+        {
+            "_id": str(doc["_id"]),
+            "title": doc.get("title", ""),
+            "content": doc.get("content", ""),
+            "authors": doc.get("authors", []),
+            "tags": doc.get("tags", []),
+            "upload_date": doc.get("upload_date"),
+            "score": doc.get("text_score", 0.0)
+        }
+        for doc in docs
+    ]
+
+
+async def vector_search(
+    collection,
+    query_embedding,
+    limit: int,
+    filters: Optional[dict] = None,
+    field: str = V1_FIELD
+):
+    """
+    Semantic ranking: passages merged with Atlas $vectorSearch or the local index
+    The local indexes only score the documents passing the filters, whose ids
+    come from MongoDB (a posting list); filters matching more than
+    SEARCH_FILTER_MAX_IDS documents are applied after ranking instead.
+    After a model migration (field content_embedding_v2) passages are skipped:
+    they still hold vectors of the previous model.
+    """
+    use_passages = field == V1_FIELD and len(chunk_index)
+    index = vector_index if field == V1_FIELD else vector_index_v2
+    
+    document_ids = None
+    if filters and (use_passages or len(index)):
+        document_ids = await matching_document_ids(collection, filters, settings.SEARCH_FILTER_MAX_IDS)
+        if document_ids == []:
+            return []
+    
+    async def filtered(search):
+        """search(k, document_ids) restricted to the filters"""
+        if not filters or document_ids is not None:
+            return await search(limit, document_ids)
+        return await post_filtered(collection, filters, limit, lambda k: search(k, None))
+    
+    # Passage-level search: documents ranked by their best-matching chunk
+    passage_results = []
+    if use_passages:
+        try:
+            passage_results = await filtered(
+                lambda k, ids: passage_search(database.search_db, query_embedding, k, ids)
+            )
+            print(f"Passage search returned {len(passage_results)} results")
+        except Exception as e:
+            print(f"Passage search failed: {e}")
+    
+    # Document-level search, also for documents that have no passages yet
+    document_results = []
+    try:
+        vector_stage = {
+            "index": "vector_index" if field == V1_FIELD else V2_SEARCH_INDEX,
+            "path": field,
+            "queryVector": query_embedding,
+            "numCandidates": limit * 10,
+            "limit": limit
+        }
+        if filters:
+            # Filter fields must be declared as "filter" fields in the Atlas index
+            vector_stage["filter"] = filters
+        pipeline = [
+            {"$vectorSearch": vector_stage},
             {
                 "$project": {
                     "_id": {"$toString": "$_id"},
@@ -46,21 +285,58 @@ async def search_documents(
             }
         ]
         
-        results = await collection.aggregate(pipeline).to_list(length=limit)
-        
-        # If vector search returns results, return them
-        if results:
-            print(f"Vector search returned {len(results)} results")
-            return results
+        document_results = await collection.aggregate(pipeline).to_list(length=limit)
+        if document_results:
+            print(f"Vector search returned {len(document_results)} results")
         
     except Exception as e:
         print(f"Vector search not available: {e}")
     
-    # Fallback: Use text search with manual similarity calculation
+    # Fallback: In-process vector index over the same field
+    if not document_results and len(index):
+        try:
+            document_results = await filtered(
+                lambda k, ids: local_vector_search(collection, query_embedding, k, ids, index)
+            )
+            print(f"Local vector index returned {len(document_results)} results")
+        except Exception as e:
+            print(f"Local vector search failed: {e}")
+    
+    return merge_by_document(passage_results, document_results, limit)
+
+
+def merge_by_document(passage_results: list, document_results: list, limit: int) -> list:
+    """
+    One result per document, at its best score from either ranking
+    Documents never split into passages (see scripts/backfill_passages.py)
+    still rank by their whole-document vector. Passage hits keep the
+    matching passage as their snippet.
+    """
+    merged = {result["_id"]: result for result in document_results}
+    for result in passage_results:
+        document = merged.get(result["_id"])
+        if document is not None and document["score"] > result["score"]:
+            result = {**result, "score": document["score"]}
+        merged[result["_id"]] = result
+    return sorted(merged.values(), key=lambda result: result["score"], reverse=True)[:limit]
+
+
+async def regex_search(
+    collection,
+    q: str,
+    query_embedding,
+    limit: int,
+    filters: Optional[dict] = None,
+    field: str = V1_FIELD
+):
+    """Unindexed substring match, used only when neither index can answer"""
+    # Last resort: Use text search with manual similarity calculation
     print(f"Using text search fallback for query: {q}")
     
     try:
-        # Text-based search with regex
+        # Text-based search with regex: fetch only ids and embeddings so the
+        # candidate pool can be wide, then score them in one matmul
+        candidates = settings.SEARCH_FALLBACK_CANDIDATES
         cursor = collection.find(
             {
                 "$or": [
@@ -68,56 +344,103 @@ async def search_documents(
                     {"content": {"$regex": q, "$options": "i"}},
                     {"tags": {"$regex": q, "$options": "i"}},
                     {"authors": {"$regex": q, "$options": "i"}}
-                ]
+                ],
+                **(filters or {})
             },
-            {
-                "_id": 1,
-                "title": 1,
-                "content": 1,
-                "authors": 1,
-                "tags": 1,
-                "upload_date": 1,
-                "content_embedding": 1
-            }
-        ).limit(limit * 2)  # Get more candidates for scoring
+            {"_id": 1, **embedding_projection(field)}
+        ).limit(candidates)
         
-        docs = await cursor.to_list(length=limit * 2)
+        docs = await cursor.to_list(length=candidates)
         
         if not docs:
             print("No documents found with text search")
             return []
         
-        # Calculate similarity scores manually
-        results = []
-        for doc in docs:
-            # Calculate cosine similarity if embeddings exist
-            score = 0.5  # default score
-            if "content_embedding" in doc and doc["content_embedding"]:
-                try:
-                    # Simple dot product for similarity (normalized embeddings)
-                    doc_embedding = doc["content_embedding"]
-                    if len(doc_embedding) == len(query_embedding):
-                        score = sum(a * b for a, b in zip(query_embedding, doc_embedding))
-                        score = max(0, min(1, (score + 1) / 2))  # Normalize to 0-1
-                except Exception as e:
-                    print(f"Error calculating similarity: {e}")
-            
-            results.append({
-                "_id": str(doc["_id"]),
-                "title": doc.get("title", ""),
-                "content": doc.get("content", "")[:500],
-                "authors": doc.get("authors", []),
-                "tags": doc.get("tags", []),
-                "upload_date": doc.get("upload_date"),
-                "score": score
-            })
-        
-        # Sort by score
-        results.sort(key=lambda x: x["score"], reverse=True)
+        ranked = rank_candidates([decode_embedding(doc, field) for doc in docs], query_embedding, limit)
+        hits = [(str(docs[row]["_id"]), similarity) for row, similarity in ranked]
+        results = await fetch_hits(collection, hits)
         
-        print(f"Text search returned {len(results[:limit])} results")
-        return results[:limit]
+        print(f"Text search returned {len(results)} results from {len(docs)} candidates")
+        return results
         
     except Exception as e:
         print(f"Search error: {e}")
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+
+async def local_vector_search(
+    collection,
+    query_embedding,
+    limit: int,
+    document_ids: Optional[List[str]] = None,
+    index=vector_index
+):
+    """Rank documents with the in-process vector index and fetch their fields"""
+    hits = index.search(query_embedding, limit, document_ids)
+    return await fetch_hits(collection, hits)
+
+
+async def fetch_hits(collection, hits):
+    """Fetch display fields for ranked (document id, similarity) pairs"""
+    if not hits:
+        return []
+    
+    cursor = collection.find(
+        {"_id": {"$in": [ObjectId(doc_id) for doc_id, _ in hits]}},
+        {
+            "_id": 1,
+            "title": 1,
+            "content": {"$substr": ["$content", 0, 500]},
+            "authors": 1,
+            "tags": 1,
+            "upload_date": 1
+        }
+    )
+    docs = {str(doc["_id"]): doc async for doc in cursor}
+    
+    results = []
+    for doc_id, similarity in hits:
+        doc = docs.get(doc_id)
+        if not doc:
+            continue
+        results.append({
+            "_id": doc_id,
+            "title": doc.get("title", ""),
+            "content": doc.get("content", ""),
+            "authors": doc.get("authors", []),
+            "tags": doc.get("tags", []),
+            "upload_date": doc.get("upload_date"),
+            "score": max(0, min(1, (similarity + 1) / 2))  # Normalize to 0-1
+        })
+    
+    return results
+
+
+async def passage_search(db, query_embedding, limit: int, document_ids: Optional[List[str]] = None):
+    """Return documents with their best-matching passage as the snippet"""
+    passages = await search_passages(db.chunks, query_embedding, limit, document_ids)
+    if not passages:
+        return []
+    
+    cursor = db[settings.COLLECTION_NAME].find(
+        {"_id": {"$in": [ObjectId(doc_id) for doc_id, _, _ in passages]}},
+        {"_id": 1, "title": 1, "authors": 1, "tags": 1, "upload_date": 1}
+    )
+    docs = {str(doc["_id"]): doc async for doc in cursor}
+    
+    results = []
+    for doc_id, similarity, passage in passages:
+        doc = docs.get(doc_id)
+        if not doc:
+            continue
+        results.append({
+            "_id": doc_id,
+            "title": doc.get("title", ""),
+            "content": passage[:500],
+            "authors": doc.get("authors", []),
+            "tags": doc.get("tags", []),
+            "upload_date": doc.get("upload_date"),
+            "score": max(0, min(1, (similarity + 1) / 2))  # Normalize to 0-1
+        })
+    
+    return results
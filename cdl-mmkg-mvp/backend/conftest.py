@@ -0,0 +1,21 @@
+"""
+Shared setup for the pytest modules in this directory
+
+Settings are pointed away from MongoDB and from files shared with a running
+API before any backend module is imported; `fake_db` is an in-memory
+database from fake_mongo.py.
+"""
+import os
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ["EMBEDDING_CACHE_PATH"] = ""
+os.environ["CACHE_GENERATION_PATH"] = ""
+
+import pytest
+
+from fake_mongo import FakeDatabase
+
+
+@pytest.fixture
+def fake_db():
+    return FakeDatabase()
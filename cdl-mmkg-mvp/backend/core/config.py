@@ -1,8 +1,126 @@
+import os
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     MONGO_URI: str
+    DATABASE_NAME: str = "cdl_mvp"
+    COLLECTION_NAME: str = "documents"
+    
+    # MongoDB driver tuning (None keeps the driver/server default)
+    MONGO_MAX_POOL_SIZE: int = 100
+    MONGO_MIN_POOL_SIZE: int = 0
+    MONGO_MAX_IDLE_TIME_MS: Optional[int] = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: Optional[int] = None  # fail fast instead of queueing for a connection
+    MONGO_CONNECT_TIMEOUT_MS: int = 20000
+    MONGO_SOCKET_TIMEOUT_MS: Optional[int] = None
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 30000
+    MONGO_COMPRESSORS: Optional[str] = None  # e.g. "zstd,snappy,zlib" (zstd needs zstandard, snappy needs python-snappy)
+    MONGO_READ_PREFERENCE: str = "primary"
+    MONGO_SEARCH_READ_PREFERENCE: str = "secondaryPreferred"
+    MONGO_WRITE_CONCERN: Optional[str] = None  # "majority" or a node count
+    MONGO_WRITE_JOURNAL: Optional[bool] = None
+    
+    # Sidecar embedding snapshot shared by all workers (see services/embedding_store.py)
+    EMBEDDING_STORE_DIR: str = "embedding_store"
+    EMBEDDING_STORE_DTYPE: str = "float32"  # float32, float16 or int8
+    
+    # How content_embedding is stored in MongoDB: list (BSON doubles), float32
+    # or int8 (BSON binary vectors, see services/vector_codec.py). Atlas
+    # $vectorSearch reads list and float32; int8 is served by the local indexes.
+    EMBEDDING_STORAGE_FORMAT: str = "float32"
+    
+    # Hybrid search: reciprocal rank fusion constant, and how many results
+    # per page each ranking contributes to the fusion
+    RRF_K: int = 60
+    HYBRID_CANDIDATE_MULTIPLIER: int = 4
+    
+    # Regex matches rescored against the query when no vector index is available
+    SEARCH_FALLBACK_CANDIDATES: int = 2000
+    
+    # Filters matching up to this many documents restrict the local indexes to
+    # their ids; broader filters are applied to the ranked results instead,
+    # widening the candidate list from limit * SEARCH_POST_FILTER_OVERSAMPLE
+    SEARCH_FILTER_MAX_IDS: int = 20000
+    SEARCH_POST_FILTER_OVERSAMPLE: int = 4
+    
+    # Passage chunking for long documents (chunk vectors are int8 by default)
+    CHUNK_WORDS: int = 160
+    CHUNK_OVERLAP_WORDS: int = 32
+    CHUNK_STORE_DTYPE: str = "int8"
+    
+    # Largest accepted upload
+    MAX_UPLOAD_BYTES: int = 100 * 1024 * 1024
+    
+    # Worker processes for background upload ingestion (extraction + embedding)
+    INGEST_WORKERS: int = max(1, min(4, os.cpu_count() or 1))
+    # A running job is claimed by one API worker for this long and renewed while
+    # it runs; jobs whose lease expired (worker died) are recovered at startup
+    INGEST_JOB_LEASE_SECONDS: int = 300
+    # Page-range processes per large PDF, and an optional cap on extracted text
+    PDF_EXTRACT_WORKERS: int = 1
+    MAX_EXTRACT_CHARS: Optional[int] = None
+    
+    # Bounded executors (services/executors.py); requests beyond workers + queue get 429
+    INFERENCE_THREADS: int = 2
+    INFERENCE_QUEUE_SIZE: int = 256
+    EXTRACTION_QUEUE_SIZE: int = 64
+    IO_THREADS: int = 4
+    IO_QUEUE_SIZE: int = 256
+    
+    # Sentence-transformers model used for every embedding, and how it runs:
+    # "sentence-transformers" (PyTorch) or "onnx" (ONNX Runtime, export it first
+    # with scripts/export_onnx_model.py; quantized = dynamic int8 weights)
+    EMBEDDING_MODEL_NAME: str = "all-MiniLM-L6-v2"
+    # Hugging Face revision to pin (empty = latest); part of the embedding cache key
+    EMBEDDING_MODEL_REVISION: str = ""
+    EMBEDDING_BACKEND: str = "sentence-transformers"
+    ONNX_MODEL_DIR: str = "onnx_models"
+    ONNX_QUANTIZED: bool = True
+    
+    # Micro-batching of concurrent embedding requests
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+    EMBEDDING_BATCH_MAX_WAIT_MS: float = 5.0
+    
+    # Shared embedding sidecar (python -m services.embedding_server): when the
+    # socket is set, workers send batches there instead of loading the model
+    EMBEDDING_SIDECAR_SOCKET: str = ""
+    EMBEDDING_SIDECAR_MAX_BATCH: int = 128
+    EMBEDDING_SIDECAR_TIMEOUT_S: float = 60.0
+    
+    # Persistent (model, revision, sha256(text)) -> vector cache filled by document
+    # writes and read first by bulk tools; None disables it
+    EMBEDDING_CACHE_PATH: Optional[str] = "embedding_cache/embeddings.sqlite"
+    
+    # Model migration: the model being rolled out, written to content_embedding_v2
+    # by every write and by scripts/reembed.py; /search switches to it once the
+    # job has seen 100% coverage. Set it on all API workers before running the job.
+    EMBEDDING_V2_MODEL_NAME: Optional[str] = None
+    EMBEDDING_V2_MODEL_REVISION: str = ""
+    EMBEDDING_V2_DIM: int = 384
+    # Fold query case in the v2 query cache only if the v2 tokenizer is uncased
+    EMBEDDING_V2_UNCASED: bool = False
+    REEMBED_BATCH_SIZE: int = 64
+    REEMBED_MAX_DOCS_PER_SECOND: float = 20.0
+    # How often each worker re-reads the migration state
+    EMBEDDING_FIELD_REFRESH_SECONDS: float = 5.0
+    
+    # Query-embedding cache for /search (set the shared path to share it across workers)
+    QUERY_CACHE_SIZE: int = 1024
+    QUERY_CACHE_TTL_SECONDS: float = 3600
+    QUERY_CACHE_SHARED_PATH: Optional[str] = None
+    # all-MiniLM-L6-v2 has an uncased tokenizer, so queries differing only in case
+    # share a cache entry; set False for a cased EMBEDDING_MODEL_NAME
+    EMBEDDING_MODEL_UNCASED: bool = True
+    
+    # Full /search response cache, invalidated by a write generation counter.
+    # The counter is a file next to the embedding store journal, so writes from
+    # any worker, bulk_ingest.py or reembed.py invalidate every worker's pages;
+    # empty keeps it per process (single worker only)
+    SEARCH_RESULT_CACHE_SIZE: int = 512
+    SEARCH_RESULT_CACHE_TTL_SECONDS: float = 300
+    CACHE_GENERATION_PATH: Optional[str] = "embedding_store/cache_generation"
     
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -12,3 +130,15 @@ class Settings(BaseSettings):
 
 
 settings = Settings()
+
+
+# Embedding fields and their Atlas search indexes, shared by the index registry
+# and the model migration (services/embedding_migration.py)
+V1_FIELD = "content_embedding"
+V2_FIELD = "content_embedding_v2"
+V2_MODEL_FIELD = "embedding_model_v2"
+V2_SEARCH_INDEX = "vector_index_v2"
+
+# Set on the first document stored for each content_hash; a partial unique index
+# lets only one of two concurrent uploads of the same text claim it
+CONTENT_PRIMARY_FIELD = "content_primary"
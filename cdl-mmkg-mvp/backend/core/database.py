@@ -1,15 +1,130 @@
+import threading
+
 import motor.motor_asyncio
+from pymongo.monitoring import ConnectionPoolListener
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
 from core.config import settings
 
 
+class PoolMonitor(ConnectionPoolListener):
+    """Connection pool counters, fed by pymongo's CMAP events (called from driver threads)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open": self.open,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_checkout_wait_ms": round(self.wait_seconds_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_checkout_wait_ms": round(self.wait_seconds_max * 1000, 3),
+                "max_pool_size": settings.MONGO_MAX_POOL_SIZE
+            }
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_seconds_total += event.duration
+            self.wait_seconds_max = max(self.wait_seconds_max, event.duration)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
+def client_options() -> dict:
+    """Driver options from Settings (unset values keep the driver/server defaults)"""
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "readPreference": settings.MONGO_READ_PREFERENCE
+    }
+    optional = {
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGO_SOCKET_TIMEOUT_MS,
+        "compressors": settings.MONGO_COMPRESSORS,
+        "w": int(settings.MONGO_WRITE_CONCERN) if (settings.MONGO_WRITE_CONCERN or "").isdigit() else settings.MONGO_WRITE_CONCERN,
+        "journal": settings.MONGO_WRITE_JOURNAL
+    }
+    options.update({name: value for name, value in optional.items() if value not in (None, "")})
+    return options
+
+
 class Database:
     def __init__(self):
         self.client = None
-    
+        self.db = None
+        self.search_db = None
+        self.documents = None
+        self.search_documents = None
+        self.pool_monitor = PoolMonitor()
+
     async def connect(self):
-        self.client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGO_URI)
+        self.client = motor.motor_asyncio.AsyncIOMotorClient(
+            settings.MONGO_URI,
+            event_listeners=[self.pool_monitor],
+            **client_options()
+        )
+        self.db = self.client[settings.DATABASE_NAME]
+        self.documents = self.db[settings.COLLECTION_NAME]
+        # Search tolerates slightly stale reads, so it can be served by secondaries
+        self.search_db = self.db.with_options(
+            read_preference=make_read_preference(read_pref_mode_from_name(settings.MONGO_SEARCH_READ_PREFERENCE), None)
+        )
+        self.search_documents = self.search_db[settings.COLLECTION_NAME]
         print("Connected to MongoDB")
-    
+
+    def pool_stats(self) -> dict:
+        return self.pool_monitor.stats()
+
     async def close(self):
         self.client.close()
         print("Closed MongoDB connection")
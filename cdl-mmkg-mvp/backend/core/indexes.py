@@ -0,0 +1,178 @@
+"""
+Declarative index registry
+
+Every index the API relies on is declared here and ensured at startup.
+Creating an index that already exists is a no-op, as long as it keeps the
+same name (MongoDB's default unless given). QUERY_SHAPES lists the hot
+queries; scripts/ensure_indexes.py --check explains each of them and fails
+if any still needs a collection scan.
+"""
+from datetime import datetime
+from typing import Dict, List
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from pymongo.operations import SearchIndexModel
+
+from core.config import CONTENT_PRIMARY_FIELD, V2_FIELD, V2_SEARCH_INDEX, settings
+from services.vector_index import EMBEDDING_DIM
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    settings.COLLECTION_NAME: [
+        # Content deduplication. Re-uploads still get their own document, but only
+        # one document per text is the primary whose vectors the others reuse
+        IndexModel([("content_hash", ASCENDING)]),
+        IndexModel(
+            [("content_hash", ASCENDING), (CONTENT_PRIMARY_FIELD, ASCENDING)],
+            unique=True,
+            partialFilterExpression={CONTENT_PRIMARY_FIELD: True},
+            name="content_hash_primary"
+        ),
+        IndexModel([("metadata.file_sha256", ASCENDING)]),
+        # Keyset pagination of GET /documents, plain and filtered by tag
+        # (also serves the upload_date range filter and the null-date scan)
+        IndexModel([("upload_date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("tags", ASCENDING), ("upload_date", DESCENDING), ("_id", DESCENDING)]),
+        # /search filters
+        IndexModel([("authors", ASCENDING)]),
+        IndexModel([("metadata.file_type", ASCENDING)]),
+        # Keyword side of hybrid search (a collection can only have one text index)
+        IndexModel(
+            [("title", TEXT), ("content", TEXT), ("authors", TEXT), ("tags", TEXT)],
+            weights={"title": 10, "authors": 5, "tags": 5, "content": 1},
+            name="documents_text"
+        )
+    ],
+    "chunks": [
+        # Which documents already have passages (scripts/backfill_passages.py)
+        IndexModel([("document_id", ASCENDING)])
+    ],
+    "ingest_jobs": [
+        # Jobs recovered at startup and after a lease expires
+        IndexModel([("status", ASCENDING)])
+    ]
+}
+
+
+# Atlas Vector Search indexes (only created on clusters that support them)
+def _vector_search_index(name: str, path: str, dimensions: int) -> SearchIndexModel:
+    return SearchIndexModel(
+        name=name,
+        type="vectorSearch",
+        definition={
+            "fields": [
+                {"type": "vector", "path": path, "numDimensions": dimensions, "similarity": "cosine"},
+                # Fields usable in the $vectorSearch pre-filter of /search
+                {"type": "filter", "path": "tags"},
+                {"type": "filter", "path": "authors"},
+                {"type": "filter", "path": "upload_date"},
+                {"type": "filter", "path": "metadata.file_type"}
+            ]
+        }
+    )
+
+
+SEARCH_INDEXES: Dict[str, List[SearchIndexModel]] = {
+    settings.COLLECTION_NAME: [_vector_search_index("vector_index", "content_embedding", EMBEDDING_DIM)]
+}
+if settings.EMBEDDING_V2_MODEL_NAME:
+    # Built while the migration backfills, so it is ready by the switch-over
+    SEARCH_INDEXES[settings.COLLECTION_NAME].append(
+        _vector_search_index(V2_SEARCH_INDEX, V2_FIELD, settings.EMBEDDING_V2_DIM)
+    )
+
+
+# Hot query shapes that must be answered from an index: (name, collection, find kwargs)
+_SAMPLE_ID = ObjectId()
+_SAMPLE_DATE = datetime(2024, 1, 1)
+QUERY_SHAPES = [
+    ("duplicate by content hash", settings.COLLECTION_NAME, {"filter": {"content_hash": "0" * 64}}),
+    ("duplicate by file hash", settings.COLLECTION_NAME, {"filter": {"metadata.file_sha256": "0" * 64}}),
+    ("list newest first", settings.COLLECTION_NAME, {"filter": {}, "sort": [("upload_date", -1), ("_id", -1)], "limit": 50}),
+    ("list by tag", settings.COLLECTION_NAME, {
+        "filter": {"tags": {"$in": ["sample"]}},
+        "sort": [("upload_date", -1), ("_id", -1)],
+        "limit": 50
+    }),
+    ("list after cursor", settings.COLLECTION_NAME, {
+        "filter": {"$or": [
+            {"upload_date": {"$lt": _SAMPLE_DATE}},
+            {"upload_date": _SAMPLE_DATE, "_id": {"$lt": _SAMPLE_ID}},
+            {"upload_date": None}
+        ]},
+        "sort": [("upload_date", -1), ("_id", -1)],
+        "limit": 50
+    }),
+    ("search filter by author", settings.COLLECTION_NAME, {"filter": {"authors": {"$in": ["sample"]}}}),
+    ("search filter by file type", settings.COLLECTION_NAME, {"filter": {"metadata.file_type": {"$in": [".pdf"]}}}),
+    ("search filter by date range", settings.COLLECTION_NAME, {"filter": {"upload_date": {"$gte": _SAMPLE_DATE, "$lte": _SAMPLE_DATE}}}),
+    ("keyword search", settings.COLLECTION_NAME, {"filter": {"$text": {"$search": "sample"}}}),
+    ("documents without upload date", settings.COLLECTION_NAME, {"filter": {"upload_date": None}}),
+    ("passages of a document", "chunks", {"filter": {"_id": {"$regex": f"^{_SAMPLE_ID}:"}}}),
+    ("documents with passages", "chunks", {"filter": {"document_id": {"$in": [_SAMPLE_ID]}}}),
+    ("unfinished ingestion jobs", "ingest_jobs", {"filter": {"status": {"$in": ["queued", "processing"]}}})
+]
+
+
+async def ensure_indexes(db) -> int:
+    """Create every registered index that is missing; returns how many are declared"""
+    declared = 0
+    for collection, models in INDEXES.items():
+        for model in models:
+            declared += 1
+            try:
+                await db[collection].create_indexes([model])
+            except OperationFailure as e:
+                # e.g. an older index with the same keys under another name
+                print(f"⚠️  Could not create index {collection}.{model.document['name']}: {e}")
+    return declared
+
+
+async def ensure_search_indexes(db) -> bool:
+    """Create missing Atlas Vector Search indexes; False where the server has no search support"""
+    for collection, models in SEARCH_INDEXES.items():
+        try:
+            existing = {index["name"] async for index in db[collection].list_search_indexes()}
+            missing = [model for model in models if model.document["name"] not in existing]
+            if missing:
+                await db[collection].create_search_indexes(missing)
+        except OperationFailure as e:
+            print(f"ℹ️  Atlas Search indexes not available, using local vector indexes ({e.code})")
+            return False
+    return True
+
+
+def _plan_stages(plan) -> List[str]:
+    """Every stage name in an explain() plan tree"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+
+async def check_query_plans(db) -> List[str]:
+    """Explain every hot query shape; returns the names of those that scan a collection"""
+    failures = []
+    for name, collection, query in QUERY_SHAPES:
+        cursor = db[collection].find(query["filter"])
+        if "sort" in query:
+            cursor = cursor.sort(query["sort"])
+        if "limit" in query:
+            cursor = cursor.limit(query["limit"])
+
+        explain = await cursor.explain()
+        stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+        if "COLLSCAN" in stages:
+            failures.append(name)
+            print(f"❌ {name}: COLLSCAN ({' <- '.join(stages)})")
+        else:
+            print(f"✅ {name}: {' <- '.join(stages)}")
+    return failures
@@ -0,0 +1,196 @@
+"""
+In-memory stand-in for the motor database used by the test_*.py modules
+
+Supports the query operators and update forms the services use, and
+enforces `_id` plus the unique indexes declared in core/indexes.py, so
+duplicate-key handling is exercised against the real index registry.
+"""
+import copy
+import re
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from core.indexes import INDEXES
+
+
+def get_field(doc: dict, path: str):
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, branch) for branch in condition):
+                return False
+            continue
+        value = get_field(doc, field)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$lt" and not (value is not None and value < operand):
+                    return False
+                if op == "$lte" and not (value is not None and value <= operand):
+                    return False
+                if op == "$gt" and not (value is not None and value > operand):
+                    return False
+                if op == "$exists" and (value is not None) != operand:
+                    return False
+                if op == "$regex" and not re.search(operand, str(value or "")):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def apply_update(doc: dict, update: dict, inserting: bool = False):
+    doc.update(update.get("$set", {}))
+    if inserting:
+        doc.update(update.get("$setOnInsert", {}))
+    for field, amount in update.get("$inc", {}).items():
+        doc[field] = doc.get(field, 0) + amount
+    for field in update.get("$unset", {}):
+        doc.pop(field, None)
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def limit(self, count):
+        if count:
+            self.docs = self.docs[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs[:length] if length else self.docs
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeResult:
+    def __init__(self, inserted_id=None, inserted_ids=None, modified_count=0):
+        self.inserted_id = inserted_id
+        self.inserted_ids = inserted_ids
+        self.modified_count = modified_count
+
+
+class FakeCollection:
+    def __init__(self, name: str = "", docs=()):
+        self.docs = {}
+        # (key fields, partial filter) of every unique index registered for the collection
+        self.unique = [
+            (list(model.document["key"]), model.document.get("partialFilterExpression", {}))
+            for model in INDEXES.get(name, [])
+            if model.document.get("unique")
+        ]
+        for doc in docs:
+            self._put(copy.deepcopy(doc))
+
+    def _check_unique(self, doc: dict):
+        for fields, partial in self.unique:
+            if not matches(doc, partial):
+                continue
+            key = [get_field(doc, field) for field in fields]
+            for other in self.docs.values():
+                if other["_id"] != doc["_id"] and matches(other, partial) and [get_field(other, field) for field in fields] == key:
+                    raise DuplicateKeyError(f"E11000 duplicate key on {fields}")
+
+    def _put(self, doc: dict):
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("E11000 duplicate key on _id")
+        self._check_unique(doc)
+        self.docs[doc["_id"]] = doc
+
+    def _first(self, query: dict):
+        return next((doc for doc in self.docs.values() if matches(doc, query)), None)
+
+    async def find_one(self, query, projection=None):
+        doc = self._first(query)
+        return copy.deepcopy(doc) if doc is not None else None
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([copy.deepcopy(doc) for doc in self.docs.values() if matches(doc, query or {})])
+
+    async def insert_one(self, doc):
+        doc.setdefault("_id", ObjectId())
+        self._put(copy.deepcopy(doc))
+        return FakeResult(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+            self._put(copy.deepcopy(doc))
+        return FakeResult(inserted_ids=[doc["_id"] for doc in docs])
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self._first(query)
+        if doc is None:
+            return FakeResult()
+        updated = copy.deepcopy(doc)
+        apply_update(updated, update)
+        self._check_unique(updated)
+        self.docs[doc["_id"]] = updated
+        return FakeResult(modified_count=1)
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=ReturnDocument.BEFORE):
+        doc = self._first(query)
+        if doc is None:
+            if not upsert:
+                return None
+            created = {key: value for key, value in query.items() if not key.startswith("$") and not isinstance(value, dict)}
+            apply_update(created, update, inserting=True)
+            self._put(created)
+            return copy.deepcopy(created) if return_document == ReturnDocument.AFTER else None
+        before = copy.deepcopy(doc)
+        updated = copy.deepcopy(doc)
+        apply_update(updated, update)
+        self._check_unique(updated)
+        self.docs[doc["_id"]] = updated
+        return copy.deepcopy(updated) if return_document == ReturnDocument.AFTER else before
+
+    async def find_one_and_delete(self, query, projection=None):
+        doc = self._first(query)
+        if doc is not None:
+            del self.docs[doc["_id"]]
+        return doc
+
+    async def delete_many(self, query):
+        for key in [key for key, doc in self.docs.items() if matches(doc, query)]:
+            del self.docs[key]
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(name)
+        return self.collections[name]
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
@@ -20,7 +20,7 @@ async def fix_upload_dates():
         await database.connect()
         print("✅ Database connected successfully")
         
-        collection = database.client.cdl_mvp.documents
+        collection = database.documents
         
         # Count documents with null upload_date
         null_date_count = await collection.count_documents({"upload_date": None})
@@ -1,13 +1,41 @@
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
+from core.config import settings
 from core.database import database
+from core.indexes import ensure_indexes, ensure_search_indexes
+from services.embedding_store import EmbeddingStore
+from services.nlp_service import nlp_service, nlp_service_v2
+from services.embedding_migration import active_embedding, load_v2_index
+from services.cache import query_embedding_cache, search_result_cache
+from services.vector_index import vector_index
+from services.passage_index import chunk_index, load_chunk_index
+from services.ingestion import ingestion_queue
+from services.executors import ExecutorSaturated, executors
 from api.search import router as search_router
 from api.documents import router as documents_router
 import os
 
 
+def report_warm_up(task: asyncio.Task):
+    if task.cancelled():
+        return
+    if task.exception():
+        print(f"❌ Embedding model warm-up failed: {task.exception()}")
+    else:
+        print("✅ Embedding model warmed up, ready for traffic")
+
+
+async def warm_up_models():
+    await nlp_service.warm_up()
+    if nlp_service_v2 is not None:
+        # Writes embed with both models during a migration
+        await nlp_service_v2.warm_up()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
@@ -15,14 +43,58 @@ async def lifespan(app: FastAPI):
     await database.connect()
     print("✅ Database connected successfully")
     
+    # Map the persisted embedding snapshot used by the search fallback
+    store = EmbeddingStore(settings.EMBEDDING_STORE_DIR, dtype=settings.EMBEDDING_STORE_DTYPE)
+    if vector_index.attach(store):
+        print(f"✅ Vector index mapped from {store.root} ({len(vector_index)} documents)")
+    else:
+        indexed = await vector_index.load(database.documents)
+        print(f"⚠️  No embedding snapshot found, loaded {indexed} documents from MongoDB")
+        print("   Run scripts/build_embedding_store.py to enable fast startup")
+    
+    # Same for the passage (chunk) index, stored int8-quantized
+    chunk_store = EmbeddingStore(settings.EMBEDDING_STORE_DIR, name="chunks", dtype=settings.CHUNK_STORE_DTYPE)
+    if chunk_index.attach(chunk_store):
+        print(f"✅ Passage index mapped from {chunk_store.root} ({len(chunk_index)} passages)")
+    else:
+        indexed = await load_chunk_index(database.db.chunks)
+        print(f"⚠️  No passage snapshot found, loaded {indexed} passages from MongoDB")
+    
+    # During a model migration, the index over content_embedding_v2 as well
+    loaded = await load_v2_index(database.documents)
+    if loaded:
+        print(f"✅ Migration vector index (content_embedding_v2) {loaded}")
+    
+    # Indexes declared in core/indexes.py (no-op for the ones that exist)
+    declared = await ensure_indexes(database.db)
+    if await ensure_search_indexes(database.db):
+        print(f"✅ {declared} indexes and the Atlas vector index ensured")
+    else:
+        print(f"✅ {declared} indexes ensured")
+    
     # Create uploads directory if it doesn't exist
     os.makedirs("uploads", exist_ok=True)
     print("✅ Uploads directory ready")
     
+    # Load the model in the background: the worker is live now and ready once warmed up
+    warm_up = asyncio.create_task(warm_up_models())
+    warm_up.add_done_callback(report_warm_up)
+    
+    # Start the background ingestion workers and pick up unfinished jobs
+    ingestion_queue.start(database.db)
+    resumed = await ingestion_queue.resume()
+    print(f"✅ Ingestion queue ready ({settings.INGEST_WORKERS} workers, {resumed} jobs resumed)")
+    
     yield
     
     # Shutdown
     print("🛑 Shutting down...")
+    warm_up.cancel()
+    await ingestion_queue.close()
+    await nlp_service.close()
+    if nlp_service_v2 is not None:
+        await nlp_service_v2.close()
+    executors.shutdown()
     await database.close()
     print("✅ Database connection closed")
 
@@ -46,13 +118,20 @@ app.add_middleware(
     ],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"]
 )
 
 # Mount static files for uploaded documents
 if os.path.exists("uploads"):
     app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    """Overload is reported as 429 so clients back off instead of piling up"""
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+
 # Include API routers
 app.include_router(search_router)
 app.include_router(documents_router)
@@ -73,9 +152,8 @@ async def root():
     }
 
 
-@app.get("/health", tags=["health"])
-async def health_check():
-    """Health check endpoint"""
+async def readiness() -> dict:
+    """Whether this worker can serve traffic: database reachable and model warmed up"""
     try:
         # Check database connection
         await database.client.admin.command('ping')
@@ -83,9 +161,43 @@ async def health_check():
     except Exception as e:
         db_status = f"error: {str(e)}"
     
+    models_ready = nlp_service.ready and (nlp_service_v2 is None or nlp_service_v2.ready)
     return {
-        "status": "healthy",
+        "ready": db_status == "connected" and models_ready,
         "database": db_status,
+        "model": "ready" if models_ready else "loading"
+    }
+
+
+@app.get("/health/live", tags=["health"])
+async def liveness_check():
+    """Liveness: the process is up and serving requests (no dependency checks)"""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready", tags=["health"])
+async def readiness_check():
+    """Readiness: 503 until the database is reachable and the model is warmed up"""
+    status = await readiness()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/health", tags=["health"])
+async def health_check():
+    """Health check endpoint"""
+    status = await readiness()
+    
+    return {
+        "status": "healthy",
+        "live": True,
+        **status,
+        "mongo_pool": database.pool_stats(),
+        "executors": executors.stats(),
+        "embedding_queue": nlp_service.queue_depth(),
+        "embedding_cache": nlp_service.cache_stats(),
+        "embedding_field": active_embedding.field,
+        "query_embedding_cache": query_embedding_cache.stats(),
+        "search_result_cache": search_result_cache.stats(),
         "version": "2.0.0"
     }
 
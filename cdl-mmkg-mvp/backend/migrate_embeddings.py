@@ -0,0 +1,117 @@
+"""
+Migration script to convert stored content_embedding values to a compact format
+Converts every document to settings.EMBEDDING_STORAGE_FORMAT (or the format
+given on the command line: list, float32 or int8)
+
+    python migrate_embeddings.py int8
+"""
+
+import asyncio
+import sys
+from pymongo import UpdateOne
+from core.config import settings
+from core.database import database
+from services.vector_codec import (
+    STORAGE_FORMATS, FORMAT_INT8, decode_embedding, embedding_format, embedding_projection, encode_embedding
+)
+
+
+BATCH_SIZE = 1000
+
+
+async def average_document_size(collection) -> float:
+    """Average BSON size of documents that have an embedding"""
+    result = await collection.aggregate([
+        {"$match": {"content_embedding": {"$exists": True, "$ne": None}}},
+        {"$group": {"_id": None, "size": {"$avg": {"$bsonSize": "$$ROOT"}}}}
+    ]).to_list(length=1)
+    return result[0]["size"] if result else 0.0
+
+
+async def migrate_embeddings(target_format: str):
+    """Rewrite content_embedding in the target storage format"""
+    print("=" * 60)
+    print(f"Migrating Embeddings to '{target_format}'")
+    print("=" * 60)
+
+    try:
+        # Connect to database
+        print("\n1. Connecting to database...")
+        await database.connect()
+        print("✅ Database connected successfully")
+
+        collection = database.documents
+
+        total = await collection.count_documents({"content_embedding": {"$exists": True, "$ne": None}})
+        size_before = await average_document_size(collection)
+        print(f"\n2. Found {total} documents with embeddings (avg {size_before:.0f} bytes)")
+
+        # Convert documents in batches
+        print("\n3. Converting embeddings...")
+        converted = 0
+        skipped = 0
+        operations = []
+        cursor = collection.find(
+            {"content_embedding": {"$exists": True, "$ne": None}},
+            {"_id": 1, **embedding_projection()}
+        ).batch_size(BATCH_SIZE)
+
+        async for doc in cursor:
+            if embedding_format(doc["content_embedding"]) == target_format:
+                skipped += 1
+                continue
+
+            update = {"$set": encode_embedding(decode_embedding(doc), target_format)}
+            if target_format != FORMAT_INT8:
+                update["$unset"] = {"content_embedding_scale": "", "content_embedding_offset": ""}
+            operations.append(UpdateOne({"_id": doc["_id"]}, update))
+
+            if len(operations) == BATCH_SIZE:
+                result = await collection.bulk_write(operations, ordered=False)
+                converted += result.modified_count
+                operations = []
+                print(f"  - Converted {converted} documents")
+
+        if operations:
+            result = await collection.bulk_write(operations, ordered=False)
+            converted += result.modified_count
+
+        print(f"  - Converted: {converted} documents")
+        print(f"  - Already '{target_format}': {skipped} documents")
+
+        # Verify migration
+        print("\n4. Verifying migration...")
+        size_after = await average_document_size(collection)
+        print(f"  - Average document size: {size_before:.0f} -> {size_after:.0f} bytes")
+
+        doc = await collection.find_one(
+            {"content_embedding": {"$exists": True, "$ne": None}},
+            {"_id": 1, **embedding_projection()}
+        )
+        if doc:
+            print(f"  - Sample {doc['_id']}: {embedding_format(doc['content_embedding'])}, "
+                  f"{len(decode_embedding(doc))} dimensions")
+
+        print("\n" + "=" * 60)
+        print("✅ Migration completed!")
+        print("Rebuild the local index with: python scripts/build_embedding_store.py --rebuild")
+        print("=" * 60)
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+
+    finally:
+        # Disconnect
+        print("\n5. Closing connection...")
+        await database.close()
+        print("✅ Connection closed")
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else settings.EMBEDDING_STORAGE_FORMAT
+    if target not in STORAGE_FORMATS:
+        print(f"Unknown format '{target}', expected one of: {', '.join(STORAGE_FORMATS)}")
+        sys.exit(1)
+    asyncio.run(migrate_embeddings(target))
@@ -19,7 +19,7 @@ async def migrate_documents():
         await database.connect()
         print("✅ Database connected successfully")
         
-        collection = database.client.cdl_mvp.documents
+        collection = database.documents
         
         # Count documents with old schema
         old_schema_count = await collection.count_documents({"text": {"$exists": True}})
@@ -45,6 +45,8 @@ class DocumentInDB(DocumentBase):
     id: PyObjectId = Field(default_factory=PyObjectId, alias="_id")
     upload_date: datetime = Field(default_factory=datetime.utcnow)
     content_embedding: Optional[List[float]] = None
+    # "<model name>@<revision>:<runtime>" that produced content_embedding
+    embedding_model: Optional[str] = None
 
     class Config:
         populate_by_name = True
@@ -73,3 +75,16 @@ class DocumentSearchResponse(BaseModel):
     class Config:
         populate_by_name = True
         json_encoders = {datetime: lambda v: v.isoformat() if v else None}
+
+
+class IngestionJobResponse(BaseModel):
+    id: str = Field(alias="_id")
+    status: str
+    document_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    
+    class Config:
+        populate_by_name = True
+        json_encoders = {datetime: lambda v: v.isoformat() if v else None}
@@ -0,0 +1,150 @@
+"""
+Split and embed the documents that have no passages yet
+
+    python scripts/backfill_passages.py                   # start or resume
+    python scripts/backfill_passages.py --restart         # rescan from the first document
+
+Documents stored before passage indexing, or by tools that only write the
+whole-document vector, have nothing in `chunks`; /search still finds them
+through their document vector, but without a matching passage. Documents are
+scanned in _id order in batches, those without chunks are split, embedded
+and written like an upload, and the last _id is saved to a checkpoint file
+so an interrupted run resumes where it stopped.
+
+Running API workers tail the passage journal, so no restart is needed; run
+scripts/build_embedding_store.py --index chunks afterwards to fold it.
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.config import settings
+from core.database import database
+from core.indexes import ensure_indexes
+from services.cache import CollectionGeneration
+from services.chunker import split_into_passages
+from services.embedding_store import OP_UPSERT, EmbeddingStore
+from services.nlp_service import nlp_service
+from services.passage_index import build_chunk_documents
+from services.vector_index import normalize
+
+
+def load_checkpoint(path: str):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        last = f.read().strip()
+    return ObjectId(last) if last else None
+
+
+def save_checkpoint(path: str, last):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(str(last))
+
+
+class PassageBackfill:
+    def __init__(self, args):
+        self.args = args
+        self.chunk_store = EmbeddingStore(settings.EMBEDDING_STORE_DIR, name="chunks", dtype=settings.CHUNK_STORE_DTYPE)
+        self.generation = CollectionGeneration(settings.CACHE_GENERATION_PATH)
+        self.stats = {"scanned": 0, "backfilled": 0, "passages": 0}
+
+    async def run(self) -> int:
+        await database.connect()
+        try:
+            self.db = database.db
+            # The chunks lookup by document_id below needs its index
+            await ensure_indexes(self.db)
+            return await self.backfill()
+        finally:
+            await database.close()
+
+    async def backfill(self) -> int:
+        after = None if self.args.restart else load_checkpoint(self.args.checkpoint)
+        print(f"Resuming after {after}" if after else "Starting from the first document")
+
+        while True:
+            query = {"_id": {"$gt": after}} if after is not None else {}
+            docs = await database.documents.find(
+                query, {"_id": 1, "content": 1, "text": 1}
+            ).sort("_id", 1).limit(self.args.batch_size).to_list(length=self.args.batch_size)
+            if not docs:
+                break
+
+            indexed = set(await self.db.chunks.distinct(
+                "document_id", {"document_id": {"$in": [doc["_id"] for doc in docs]}}
+            ))
+            missing = [doc for doc in docs if doc["_id"] not in indexed]
+            if missing:
+                await self.write_batch(missing)
+
+            after = docs[-1]["_id"]
+            save_checkpoint(self.args.checkpoint, after)
+            self.stats["scanned"] += len(docs)
+            print(
+                f"  {self.stats['scanned']} scanned | {self.stats['backfilled']} backfilled "
+                f"| {self.stats['passages']} passages | last {after}"
+            )
+
+        print(
+            f"✅ Backfilled {self.stats['backfilled']} of {self.stats['scanned']} documents "
+            f"({self.stats['passages']} passages)"
+        )
+        return 0
+
+    async def write_batch(self, docs):
+        # Documents from scripts/ingest_data.py keep their text under "text"
+        passages = [split_into_passages(doc.get("content") or doc.get("text") or "") for doc in docs]
+        texts = [passage for item_passages in passages for passage in item_passages]
+        if not texts:
+            return
+        embeddings = await asyncio.to_thread(nlp_service.generate_embeddings, texts, self.args.embed_batch_size, True)
+
+        chunks = []
+        offset = 0
+        for doc, item_passages in zip(docs, passages):
+            chunks.extend(build_chunk_documents(doc["_id"], item_passages, embeddings[offset:offset + len(item_passages)]))
+            offset += len(item_passages)
+
+        failed = set()
+        try:
+            await self.db.chunks.insert_many(chunks, ordered=False)
+        except BulkWriteError as e:
+            # The API indexed some of these documents meanwhile: its passages win
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+
+        written = [(chunk, embedding) for position, (chunk, embedding) in enumerate(zip(chunks, embeddings)) if position not in failed]
+        # Running API workers tail this journal into their passage index
+        for chunk, embedding in written:
+            self.chunk_store.append(OP_UPSERT, chunk["_id"], normalize(embedding))
+        self.generation.bump()
+
+        self.stats["backfilled"] += len({chunk["document_id"] for chunk, _ in written})
+        self.stats["passages"] += len(written)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=256, help="Documents per batch")
+    parser.add_argument("--embed-batch-size", type=int, default=64, help="Texts per model forward pass")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <EMBEDDING_STORE_DIR>/passage_backfill_checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and rescan every document")
+    args = parser.parse_args()
+
+    if args.checkpoint is None:
+        os.makedirs(settings.EMBEDDING_STORE_DIR, exist_ok=True)
+        args.checkpoint = os.path.join(settings.EMBEDDING_STORE_DIR, "passage_backfill_checkpoint")
+    sys.exit(asyncio.run(PassageBackfill(args).run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Throughput benchmark for the embedding backends
+
+    python scripts/bench_embedding_backends.py --texts 512 --batch-sizes 1 8 32 64
+
+Encodes the same synthetic corpus with PyTorch (sentence-transformers),
+ONNX float32 and ONNX int8, and reports texts per second for each batch
+size. Backends that are not installed or not exported are skipped.
+Export the ONNX models first with scripts/export_onnx_model.py.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.config import settings
+from services.embedding_backends import OnnxBackend, SentenceTransformerBackend, onnx_model_dir
+
+WORDS = (
+    "graph knowledge retrieval embedding transformer library document search "
+    "semantic neural index query passage model vector ranking citation author"
+).split()
+
+
+def corpus(count: int, seed: int = 0):
+    """Texts of 5-200 words, roughly the mix of queries and passages"""
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(WORDS, k=rng.randint(5, 200))) for _ in range(count)]
+
+
+def load_backends(threads: int):
+    model_dir = onnx_model_dir(settings.ONNX_MODEL_DIR, settings.EMBEDDING_MODEL_NAME)
+    candidates = [
+        ("pytorch", lambda: SentenceTransformerBackend(settings.EMBEDDING_MODEL_NAME)),
+        ("onnx-float32", lambda: OnnxBackend(model_dir, quantized=False, threads=threads)),
+        ("onnx-int8", lambda: OnnxBackend(model_dir, quantized=True, threads=threads))
+    ]
+    backends = []
+    for name, factory in candidates:
+        try:
+            backends.append((name, factory()))
+        except Exception as e:
+            print(f"⚠️  Skipping {name}: {e}")
+    return backends
+
+
+def throughput(backend, texts, batch_size: int, repeats: int) -> float:
+    """Median texts per second"""
+    backend.encode(texts[:batch_size], batch_size=batch_size)
+    rates = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        backend.encode(texts, batch_size=batch_size)
+        rates.append(len(texts) / (time.perf_counter() - started))
+    return statistics.median(rates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--threads", type=int, default=0, help="ONNX intra-op threads (0 = all cores)")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = corpus(args.texts)
+    backends = load_backends(args.threads)
+    if not backends:
+        print("❌ No embedding backend available")
+        sys.exit(1)
+
+    print(f"\n{args.texts} texts, {settings.EMBEDDING_MODEL_NAME}, texts/s (higher is better)\n")
+    header = f"{'batch':>6}" + "".join(f"{name:>15}" for name, _ in backends)
+    print(header)
+    print("-" * len(header))
+    for batch_size in args.batch_sizes:
+        row = f"{batch_size:>6}"
+        for _, backend in backends:
+            row += f"{throughput(backend, texts, batch_size, args.repeats):>15.1f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
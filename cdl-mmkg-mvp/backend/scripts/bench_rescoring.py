@@ -0,0 +1,86 @@
+"""
+Micro-benchmark for rescoring text-search fallback candidates
+
+    python scripts/bench_rescoring.py --counts 100 1000 10000 50000 --format float32
+
+Compares the old per-document Python dot product + sort with decoding the
+stored embeddings and ranking them in one NumPy matmul + argpartition.
+Needs no database or model: candidates are random unit vectors encoded in
+the chosen storage format.
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from services.vector_codec import STORAGE_FORMATS, decode_embedding, encode_embedding
+from services.vector_index import EMBEDDING_DIM, rank_candidates
+
+
+def python_rescore(docs, query, limit):
+    """The original fallback: generator dot product per document, then sort"""
+    results = []
+    for doc in docs:
+        doc_embedding = decode_embedding(doc).tolist()
+        score = sum(a * b for a, b in zip(query, doc_embedding))
+        results.append((doc["_id"], max(0, min(1, (score + 1) / 2))))
+    results.sort(key=lambda x: x[1], reverse=True)
+    return results[:limit]
+
+
+def numpy_rescore(docs, query, limit):
+    ranked = rank_candidates([decode_embedding(doc) for doc in docs], query, limit)
+    return [(docs[row]["_id"], max(0, min(1, (similarity + 1) / 2))) for row, similarity in ranked]
+
+
+def measure(fn, repeats: int) -> float:
+    """Median wall time in milliseconds"""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[20, 100, 1000, 10000, 50000])
+    parser.add_argument("--format", choices=STORAGE_FORMATS, default="float32", help="Stored embedding format")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    query = rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+    query /= np.linalg.norm(query)
+    query_list = query.tolist()
+
+    print(f"{'candidates':>10} {'python ms':>10} {'numpy ms':>10} {'speedup':>8} {'us/cand':>8}")
+    for count in args.counts:
+        vectors = rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        docs = [{"_id": i, **encode_embedding(vector, args.format)} for i, vector in enumerate(vectors)]
+
+        expected = [doc_id for doc_id, _ in python_rescore(docs, query_list, args.limit)]
+        actual = [doc_id for doc_id, _ in numpy_rescore(docs, query_list, args.limit)]
+        if args.format != "int8" and expected != actual:
+            print(f"⚠️  Rankings differ at {count} candidates")
+
+        python_ms = measure(lambda: python_rescore(docs, query_list, args.limit), args.repeats)
+        numpy_ms = measure(lambda: numpy_rescore(docs, query_list, args.limit), args.repeats)
+        print(
+            f"{count:>10} {python_ms:>10.2f} {numpy_ms:>10.2f} "
+            f"{python_ms / numpy_ms:>7.1f}x {numpy_ms * 1000 / count:>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
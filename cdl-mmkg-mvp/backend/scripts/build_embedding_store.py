@@ -0,0 +1,151 @@
+"""
+Build or compact the memory-mapped embedding store
+
+    python scripts/build_embedding_store.py                  # fold the journal into a new snapshot
+    python scripts/build_embedding_store.py --rebuild        # rescan MongoDB from scratch
+    python scripts/build_embedding_store.py --index chunks   # same for the passage index
+    python scripts/build_embedding_store.py --index documents_v2 --rebuild   # during a model migration
+
+Running API workers pick up the new snapshot on their next search.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.config import settings
+from core.database import database
+from services.embedding_store import EmbeddingStore
+from services.vector_codec import decode_chunk_embedding, decode_embedding, embedding_projection
+from services.vector_index import EMBEDDING_DIM, VectorIndex
+
+
+# Where each index reads its vectors from in MongoDB
+SOURCES = {
+    "documents": {
+        "collection": settings.COLLECTION_NAME,
+        "field": "content_embedding",
+        "projection": {"_id": 1, **embedding_projection()},
+        "decode": decode_embedding
+    },
+    "documents_v2": {
+        "collection": settings.COLLECTION_NAME,
+        "field": "content_embedding_v2",
+        "projection": {"_id": 1, **embedding_projection("content_embedding_v2")},
+        "decode": lambda doc: decode_embedding(doc, "content_embedding_v2"),
+        "dim": settings.EMBEDDING_V2_DIM
+    },
+    "chunks": {
+        "collection": "chunks",
+        "field": "embedding",
+        "projection": {"_id": 1, "embedding": 1, "embedding_scale": 1, "embedding_offset": 1},
+        "decode": decode_chunk_embedding
+    }
+}
+
+
+async def rebuild(store: EmbeddingStore, source: dict, batch_size: int) -> int:
+    """Stream every embedding from MongoDB into a fresh snapshot"""
+    await database.connect()
+    collection = database.db[source["collection"]]
+
+    # Writes that land during the scan go to the new journal and are replayed on top
+    rotated = store.rotate_journal()
+    writer = store.create_snapshot_writer()
+
+    try:
+        cursor = collection.find(
+            {source["field"]: {"$exists": True, "$ne": None}},
+            source["projection"]
+        ).sort("_id", 1).batch_size(batch_size)
+
+        keys, vectors = [], []
+        async for doc in cursor:
+            embedding = source["decode"](doc)
+            if embedding is None or len(embedding) != store.dim:
+                continue
+            keys.append(str(doc["_id"]))
+            vectors.append(embedding)
+            if len(keys) >= batch_size:
+                writer.write(keys, _normalize_rows(vectors))
+                keys, vectors = [], []
+        if keys:
+            writer.write(keys, _normalize_rows(vectors))
+
+        count = writer.commit()
+    except Exception:
+        writer.abort()
+        raise
+    finally:
+        await database.close()
+
+    if rotated:
+        os.remove(rotated)
+    return count
+
+
+def compact(store: EmbeddingStore, batch_size: int) -> int:
+    """Merge the current snapshot with its journal into a new snapshot"""
+    rotated = store.rotate_journal()
+
+    index = VectorIndex(store.dim)
+    index.attach(store, replay=False)
+    if rotated:
+        for op, key, vector in store.iter_journal_file(rotated):
+            index.apply(op, key, vector)
+
+    writer = store.create_snapshot_writer()
+    try:
+        for keys, vectors in index.iter_rows(batch_size):
+            writer.write(keys, vectors)
+        count = writer.commit()
+    except Exception:
+        writer.abort()
+        raise
+
+    if rotated:
+        os.remove(rotated)
+    return count
+
+
+def _normalize_rows(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", default="documents", choices=sorted(SOURCES))
+    parser.add_argument("--rebuild", action="store_true", help="Rescan MongoDB instead of compacting")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--dir", default=settings.EMBEDDING_STORE_DIR)
+    parser.add_argument("--dtype", choices=["float32", "float16", "int8"])
+    args = parser.parse_args()
+
+    if args.dtype is None:
+        args.dtype = settings.CHUNK_STORE_DTYPE if args.index == "chunks" else settings.EMBEDDING_STORE_DTYPE
+    store = EmbeddingStore(args.dir, name=args.index, dim=SOURCES[args.index].get("dim", EMBEDDING_DIM), dtype=args.dtype)
+    started = time.perf_counter()
+
+    if args.rebuild or not store.exists():
+        print(f"Rebuilding embedding store in {store.root} from MongoDB...")
+        count = asyncio.run(rebuild(store, SOURCES[args.index], args.batch_size))
+    else:
+        print(f"Compacting embedding store in {store.root}...")
+        count = compact(store, args.batch_size)
+
+    print(f"✅ Wrote {count} vectors ({args.dtype}) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
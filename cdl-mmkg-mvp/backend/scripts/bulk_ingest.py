@@ -0,0 +1,264 @@
+"""
+Bulk-ingest a directory tree of PDF/DOCX/TXT files
+
+    python scripts/bulk_ingest.py /data/archive --workers 8 --batch-size 256
+
+Text is extracted in a process pool while the previous batch is embedded,
+documents and passages are written with insert_many, and every finished
+batch is recorded in a checkpoint file so an interrupted run resumes where
+it stopped. Files whose normalized text is already in the library are skipped.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+# Only light imports at module level: spawned extraction workers re-import this file
+from services.file_processor import compute_content_hash, extract_text_from_file
+
+
+SUPPORTED_EXTENSIONS = {".pdf", ".docx", ".doc", ".txt"}
+MIN_CONTENT_LENGTH = 10
+EMBEDDING_TEXT_LIMIT = 5000
+
+
+def find_files(root: str):
+    """Yield supported files under root in a stable order"""
+    for directory, subdirs, files in os.walk(root):
+        subdirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS:
+                yield os.path.join(directory, name)
+
+
+def extract(path: str) -> dict:
+    """Runs in a worker process"""
+    try:
+        content = extract_text_from_file(path)
+    except Exception as e:
+        return {"path": path, "error": str(e)}
+    if not content or len(content.strip()) < MIN_CONTENT_LENGTH:
+        return {"path": path, "error": "No readable content found in file"}
+    return {
+        "path": path,
+        "content": content,
+        "content_hash": compute_content_hash(content),
+        "file_size": os.path.getsize(path)
+    }
+
+
+def load_checkpoint(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def save_checkpoint(path: str, files):
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(f"{file_path}\n" for file_path in files)
+
+
+def batched(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BulkIngester:
+    def __init__(self, args):
+        from core.config import settings
+        from core.database import database
+        from services.cache import CollectionGeneration
+        from services.embedding_migration import v2_store
+        from services.embedding_store import EmbeddingStore
+
+        self.args = args
+        self.settings = settings
+        self.database = database
+        self.tags = [t.strip() for t in args.tags.split(",") if t.strip()] if args.tags else []
+        # Journal every vector so running API workers pick the new documents up
+        self.document_store = EmbeddingStore(settings.EMBEDDING_STORE_DIR, dtype=settings.EMBEDDING_STORE_DTYPE)
+        self.chunk_store = EmbeddingStore(settings.EMBEDDING_STORE_DIR, name="chunks", dtype=settings.CHUNK_STORE_DTYPE)
+        # During a model migration documents get content_embedding_v2 too
+        self.v2_store = v2_store() if settings.EMBEDDING_V2_MODEL_NAME else None
+        self.generation = CollectionGeneration(settings.CACHE_GENERATION_PATH)
+        self.stats = {"inserted": 0, "duplicates": 0, "failed": 0, "passages": 0}
+
+    async def run(self):
+        from core.indexes import ensure_indexes
+        from services.nlp_service import nlp_service, nlp_service_v2
+
+        self.nlp_service = nlp_service
+        self.nlp_service_v2 = nlp_service_v2
+        await self.database.connect()
+        self.db = self.database.db
+        await ensure_indexes(self.db)
+
+        done = load_checkpoint(self.args.checkpoint)
+        pending = (path for path in find_files(self.args.root) if path not in done)
+        print(f"Resuming after {len(done)} checkpointed files" if done else "Starting fresh run")
+
+        started = time.perf_counter()
+        pool = ProcessPoolExecutor(
+            max_workers=self.args.workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        try:
+            batches = batched(pending, self.args.batch_size)
+            # Keep one batch extracting in the pool while the current one is embedded
+            next_batch = next(batches, None)
+            in_flight = self._submit(pool, next_batch)
+            while in_flight is not None:
+                current, futures = in_flight
+                in_flight = self._submit(pool, next(batches, None))
+
+                extracted = [future.result() for future in futures]
+                await self._store_batch(extracted)
+                save_checkpoint(self.args.checkpoint, current)
+
+                elapsed = time.perf_counter() - started
+                processed = sum(self.stats[key] for key in ("inserted", "duplicates", "failed"))
+                print(
+                    f"  {processed} files | {self.stats['inserted']} inserted, "
+                    f"{self.stats['duplicates']} duplicates, {self.stats['failed']} failed | "
+                    f"{processed / elapsed:.1f} docs/sec"
+                )
+        finally:
+            pool.shutdown(cancel_futures=True)
+            await self.database.close()
+
+        print(f"\n✅ Done in {time.perf_counter() - started:.1f}s: {self.stats}")
+
+    @staticmethod
+    def _submit(pool, batch):
+        if not batch:
+            return None
+        return batch, [pool.submit(extract, path) for path in batch]
+
+    async def _store_batch(self, extracted):
+        from services.chunker import split_into_passages
+        from services.embedding_migration import v2_fields
+        from services.embedding_store import OP_UPSERT
+        from services.passage_index import build_chunk_documents
+        from services.vector_codec import encode_embedding
+        from services.vector_index import normalize
+
+        for item in extracted:
+            if "error" in item:
+                self.stats["failed"] += 1
+                print(f"  ⚠️  {item['path']}: {item['error']}")
+
+        candidates = [item for item in extracted if "error" not in item]
+        if not candidates:
+            return
+
+        # Content-hash dedup against the library and within the batch
+        hashes = [item["content_hash"] for item in candidates]
+        existing = {
+            doc["content_hash"]
+            async for doc in self.database.documents.find({"content_hash": {"$in": hashes}}, {"content_hash": 1})
+        }
+        unique = []
+        for item in candidates:
+            if item["content_hash"] in existing:
+                self.stats["duplicates"] += 1
+                continue
+            existing.add(item["content_hash"])
+            unique.append(item)
+        if not unique:
+            return
+
+        passages = [split_into_passages(item["content"]) for item in unique]
+        texts = [item["content"][:EMBEDDING_TEXT_LIMIT] for item in unique]
+        for item_passages in passages:
+            texts.extend(item_passages)
+        # Text already embedded by this model (re-runs, other libraries) comes from the cache
+        embeddings = await asyncio.to_thread(
+            self.nlp_service.generate_embeddings, texts, self.args.embed_batch_size, True
+        )
+        embeddings_v2 = [None] * len(unique)
+        if self.nlp_service_v2 is not None:
+            embeddings_v2 = await asyncio.to_thread(
+                self.nlp_service_v2.generate_embeddings, texts[:len(unique)], self.args.embed_batch_size, True
+            )
+
+        now = datetime.utcnow()
+        documents = []
+        for item, embedding, embedding_v2 in zip(unique, embeddings, embeddings_v2):
+            path = item["path"]
+            documents.append({
+                "title": Path(path).stem,
+                "content": item["content"],
+                "authors": [],
+                "tags": self.tags,
+                # No file_path: the source belongs to the caller, and deleting
+                # a document removes the file at file_path
+                "metadata": {
+                    "original_filename": os.path.basename(path),
+                    "file_size": item["file_size"],
+                    "file_type": os.path.splitext(path)[1].lower(),
+                    "source_path": os.path.relpath(path, self.args.root)
+                },
+                "content_hash": item["content_hash"],
+                "upload_date": now,
+                **encode_embedding(embedding, self.settings.EMBEDDING_STORAGE_FORMAT),
+                "embedding_model": self.nlp_service.model_id,
+                **(v2_fields(embedding_v2) if embedding_v2 is not None else {})
+            })
+        result = await self.database.documents.insert_many(documents, ordered=False)
+
+        chunks = []
+        offset = len(unique)
+        for document_id, item_passages in zip(result.inserted_ids, passages):
+            item_embeddings = embeddings[offset:offset + len(item_passages)]
+            offset += len(item_passages)
+            chunks.extend(build_chunk_documents(document_id, item_passages, item_embeddings))
+        for start in range(0, len(chunks), self.args.batch_size):
+            await self.db.chunks.insert_many(chunks[start:start + self.args.batch_size], ordered=False)
+
+        for document_id, embedding in zip(result.inserted_ids, embeddings):
+            self.document_store.append(OP_UPSERT, str(document_id), normalize(embedding))
+        for chunk, embedding in zip(chunks, embeddings[len(unique):]):
+            self.chunk_store.append(OP_UPSERT, chunk["_id"], normalize(embedding))
+        if self.v2_store is not None:
+            for document_id, embedding_v2 in zip(result.inserted_ids, embeddings_v2):
+                self.v2_store.append(OP_UPSERT, str(document_id), normalize(embedding_v2))
+        self.generation.bump()
+
+        self.stats["inserted"] += len(documents)
+        self.stats["passages"] += len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="Directory to ingest recursively")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Extraction processes")
+    parser.add_argument("--batch-size", type=int, default=256, help="Documents per insert_many")
+    parser.add_argument("--embed-batch-size", type=int, default=64, help="Texts per model forward pass")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <root>/.bulk_ingest_checkpoint)")
+    parser.add_argument("--tags", default="", help="Comma-separated tags applied to every document")
+    args = parser.parse_args()
+
+    if args.checkpoint is None:
+        args.checkpoint = os.path.join(args.root, ".bulk_ingest_checkpoint")
+
+    asyncio.run(BulkIngester(args).run())
+
+
+if __name__ == "__main__":
+    main()
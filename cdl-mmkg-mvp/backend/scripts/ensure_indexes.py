@@ -0,0 +1,54 @@
+"""
+Create the registered MongoDB indexes and verify the hot query plans
+
+    python scripts/ensure_indexes.py            # create missing indexes
+    python scripts/ensure_indexes.py --check    # ... then fail on any COLLSCAN
+
+The API ensures the same indexes at startup; run --check after deploys or
+in CI to catch a query shape that stopped using its index.
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.database import database
+from core.indexes import check_query_plans, ensure_indexes, ensure_search_indexes
+
+
+async def run(check: bool) -> int:
+    await database.connect()
+    try:
+        db = database.db
+        declared = await ensure_indexes(db)
+        print(f"✅ {declared} indexes ensured")
+        if await ensure_search_indexes(db):
+            print("✅ Atlas Vector Search indexes ensured")
+
+        if not check:
+            return 0
+
+        print("\nChecking query plans...")
+        failures = await check_query_plans(db)
+        if failures:
+            print(f"\n❌ {len(failures)} query shapes scan a whole collection: {', '.join(failures)}")
+            return 1
+        print("\n✅ Every query shape uses an index")
+        return 0
+    finally:
+        await database.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="Explain the hot queries and fail on COLLSCAN")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.check)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Export the embedding model to ONNX for EMBEDDING_BACKEND=onnx
+
+    python scripts/export_onnx_model.py                     # settings.EMBEDDING_MODEL_NAME
+    python scripts/export_onnx_model.py --model all-MiniLM-L6-v2 --output onnx_models
+
+Writes model.onnx (the transformer, float32), model.int8.onnx (the same
+graph with dynamically quantized int8 weights), tokenizer.json and
+embedding_config.json (pooling / normalization / max length) into
+<output>/<model name>/. Needs torch and sentence-transformers once, at
+export time; the API then only needs onnxruntime and tokenizers.
+Check the result with test_onnx_parity.py before switching backends.
+"""
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.config import settings
+from services.embedding_backends import (
+    ONNX_CONFIG_FILE,
+    ONNX_MODEL_FILE,
+    ONNX_QUANTIZED_MODEL_FILE,
+    onnx_model_dir
+)
+
+INPUT_NAMES = ["input_ids", "attention_mask", "token_type_ids"]
+
+
+def export(model_name: str, output_root: str, opset: int, revision: str = "") -> str:
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    output_dir = onnx_model_dir(output_root, model_name)
+    os.makedirs(output_dir, exist_ok=True)
+
+    model = SentenceTransformer(model_name, device="cpu", **({"revision": revision} if revision else {}))
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+
+    # The ONNX backend re-implements the pooling and normalize modules in NumPy
+    pooling = next((module for module in model if type(module).__name__ == "Pooling"), None)
+    if pooling is None or pooling.get_pooling_mode_str() != "mean":
+        raise ValueError(f"{model_name} does not use mean pooling; the ONNX backend only implements mean pooling")
+    normalize = any(type(module).__name__ == "Normalize" for module in model)
+
+    sample = tokenizer(["an example sentence to trace the graph"], return_tensors="pt")
+    inputs = tuple(sample[name] for name in INPUT_NAMES if name in sample)
+    input_names = [name for name in INPUT_NAMES if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            inputs,
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True
+        )
+    print(f"✅ Exported {model_path}")
+
+    # Dynamic quantization: int8 weights, activations quantized on the fly per batch
+    quantized_path = os.path.join(output_dir, ONNX_QUANTIZED_MODEL_FILE)
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    print(f"✅ Quantized {quantized_path}")
+
+    tokenizer.save_pretrained(output_dir)
+    config = {
+        "model_name": model_name,
+        "revision": revision,
+        "dim": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "normalize": normalize,
+        "pad_token": tokenizer.pad_token
+    }
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    print(f"✅ Tokenizer and {ONNX_CONFIG_FILE} written to {output_dir}")
+    return output_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL_NAME, help="Sentence-transformers model name")
+    parser.add_argument("--output", default=settings.ONNX_MODEL_DIR, help="Root directory for exported models")
+    parser.add_argument("--revision", default=settings.EMBEDDING_MODEL_REVISION, help="Model revision to export")
+    parser.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+    export(args.model, args.output, args.opset, args.revision)
+
+
+if __name__ == "__main__":
+    main()
@@ -19,7 +19,7 @@ async def main():
     ]
     
     await database.connect()
-    collection = database.client.cdl_mvp.documents
+    collection = database.documents
     
     for doc_text in sample_documents:
         embedding = nlp_service.generate_embedding(doc_text)
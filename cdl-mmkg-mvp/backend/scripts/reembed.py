@@ -0,0 +1,213 @@
+"""
+Re-embed every document with EMBEDDING_V2_MODEL_NAME into content_embedding_v2
+
+    python scripts/reembed.py                     # start or resume the migration
+    python scripts/reembed.py --rate 50           # at most 50 documents/s
+    python scripts/reembed.py --status            # print progress and exit
+    python scripts/reembed.py --no-switch         # backfill only, switch later
+
+Documents are processed in _id order in small batches. After each batch the
+last _id is saved as a checkpoint in `embedding_migrations`, so an
+interrupted run resumes where it stopped. A catch-up pass then picks up
+documents written out of order. When no document is left without a v2
+vector from this model, the migration is marked as switched and /search
+moves to content_embedding_v2 on every worker.
+
+Set EMBEDDING_V2_MODEL_NAME (and EMBEDDING_V2_DIM) on every API worker before
+starting, so new writes are embedded with both models while the job runs.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from pymongo import UpdateOne
+
+# Add the backend directory to Python path
+backend_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(backend_dir))
+
+from core.config import V1_FIELD, settings
+from core.database import database
+from services.cache import CollectionGeneration
+from services.embedding_migration import (
+    get_migration,
+    pending_filter,
+    record_progress,
+    start_migration,
+    switch_over,
+    v2_fields,
+    v2_store
+)
+from services.embedding_store import OP_UPSERT
+from services.ingestion_worker import EMBEDDING_TEXT_LIMIT
+from services.nlp_service import nlp_service_v2
+from services.vector_index import normalize
+
+CATCH_UP_PASSES = 3
+
+
+class Throttle:
+    """Sleep between batches so the average rate stays under max_per_second"""
+
+    def __init__(self, max_per_second: float):
+        self.max_per_second = max_per_second
+        self.started = time.monotonic()
+        self.count = 0
+
+    async def wait(self, count: int):
+        self.count += count
+        if self.max_per_second <= 0:
+            return
+        ahead = self.count / self.max_per_second - (time.monotonic() - self.started)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.monotonic() - self.started
+        return self.count / elapsed if elapsed else 0.0
+
+
+class Reembedder:
+    def __init__(self, args):
+        self.args = args
+        self.model_id = None
+        self.store = v2_store()
+        self.throttle = Throttle(args.rate)
+
+    async def run(self) -> int:
+        await database.connect()
+        try:
+            self.db = database.db
+            self.collection = database.documents
+            if self.args.status:
+                await self.print_status()
+                return 0
+            return await self.migrate()
+        finally:
+            await database.close()
+
+    async def print_status(self):
+        state = await get_migration(self.db)
+        if state is None:
+            print("No embedding migration started")
+            return
+        total = await self.collection.count_documents({V1_FIELD: {"$ne": None}})
+        remaining = await self.collection.count_documents(pending_filter(state["model"]))
+        coverage = (total - remaining) / total if total else 1.0
+        print(f"Model:     {state['model']}")
+        print(f"Status:    {state['status']} (switched: {state['switched']})")
+        print(f"Coverage:  {coverage:.2%} ({total - remaining}/{total}, {remaining} remaining)")
+        print(f"Processed: {state['processed']} documents, checkpoint {state.get('checkpoint')}")
+
+    async def migrate(self) -> int:
+        # Loads the v2 model and opens the persistent cache before any batch
+        self.model_id = nlp_service_v2.model_id
+
+        state = await start_migration(self.db, self.model_id, restart=self.args.restart)
+        if state["model"] != self.model_id:
+            print(f"❌ A migration to {state['model']} is in progress; pass --restart to start over with {self.model_id}")
+            return 1
+        if state["switched"]:
+            print(f"✅ Already switched to {self.model_id}")
+            return 0
+
+        total = await self.collection.count_documents({V1_FIELD: {"$ne": None}})
+        print(f"Re-embedding {total} documents with {self.model_id} (max {self.args.rate:g} docs/s)")
+        await record_progress(self.db, 0, total=total)
+
+        # Pass 1: everything after the checkpoint, in _id order
+        checkpoint = state.get("checkpoint")
+        print(f"Resuming after {checkpoint}" if checkpoint else "Starting from the first document")
+        await self.scan(checkpoint, save_checkpoint=True)
+
+        # Catch-up: documents inserted behind the checkpoint or written by
+        # workers that were not dual-writing yet
+        for _ in range(CATCH_UP_PASSES):
+            remaining = await self.collection.count_documents(pending_filter(self.model_id))
+            if not remaining:
+                break
+            print(f"Catch-up pass over {remaining} documents")
+            await self.scan(None, save_checkpoint=False)
+
+        remaining = await self.collection.count_documents(pending_filter(self.model_id))
+        coverage = (total - remaining) / total if total else 1.0
+        await record_progress(self.db, 0, remaining=remaining, coverage=coverage)
+        if remaining:
+            print(f"⚠️  {remaining} documents still lack a v2 vector; run again to finish")
+            return 1
+
+        if self.args.no_switch:
+            print("✅ 100% coverage; run again without --no-switch to switch /search over")
+            return 0
+        if await switch_over(self.db):
+            # Cached /search pages were ranked with the old model
+            CollectionGeneration(settings.CACHE_GENERATION_PATH).bump()
+        print(f"✅ 100% coverage, /search switched to content_embedding_v2 ({self.model_id})")
+        return 0
+
+    async def scan(self, after, save_checkpoint: bool):
+        while True:
+            query = pending_filter(self.model_id)
+            if after is not None:
+                query["_id"] = {"$gt": after}
+            docs = await self.collection.find(
+                query, {"_id": 1, "content": 1, "content_hash": 1}
+            ).sort("_id", 1).limit(self.args.batch_size).to_list(length=self.args.batch_size)
+            if not docs:
+                return
+
+            written = await self.write_batch(docs)
+            after = docs[-1]["_id"]
+            await record_progress(self.db, written, checkpoint=after if save_checkpoint else None)
+            await self.throttle.wait(len(docs))
+            print(f"  {self.throttle.count} documents | {self.throttle.rate:.1f} docs/s | last {after}")
+
+    async def write_batch(self, docs) -> int:
+        texts = [(doc.get("content") or "")[:EMBEDDING_TEXT_LIMIT] for doc in docs]
+        embeddings = await asyncio.to_thread(nlp_service_v2.generate_embeddings, texts, self.args.embed_batch_size, True)
+
+        # Matching on content_hash skips documents whose text changed meanwhile:
+        # the API already wrote their v2 vector from the new text
+        operations = [
+            UpdateOne({"_id": doc["_id"], "content_hash": doc.get("content_hash")}, {"$set": v2_fields(embedding)})
+            for doc, embedding in zip(docs, embeddings)
+        ]
+        result = await self.collection.bulk_write(operations, ordered=False)
+
+        skipped = set()
+        if result.matched_count < len(docs):
+            # Changed or deleted since the read: keep them out of the local indexes too
+            current = {
+                doc["_id"]: doc.get("content_hash")
+                async for doc in self.collection.find({"_id": {"$in": [doc["_id"] for doc in docs]}}, {"content_hash": 1})
+            }
+            skipped = {doc["_id"] for doc in docs if doc["_id"] not in current or current[doc["_id"]] != doc.get("content_hash")}
+
+        # Running API workers tail this journal into their v2 index
+        for doc, embedding in zip(docs, embeddings):
+            if doc["_id"] not in skipped:
+                self.store.append(OP_UPSERT, str(doc["_id"]), normalize(embedding))
+        return result.modified_count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=settings.REEMBED_BATCH_SIZE, help="Documents per batch")
+    parser.add_argument("--rate", type=float, default=settings.REEMBED_MAX_DOCS_PER_SECOND, help="Max documents/s (0 = unthrottled)")
+    parser.add_argument("--embed-batch-size", type=int, default=64, help="Texts per model forward pass")
+    parser.add_argument("--status", action="store_true", help="Print progress and exit")
+    parser.add_argument("--no-switch", action="store_true", help="Stop at 100%% coverage without switching /search")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoint (e.g. after changing the v2 model)")
+    args = parser.parse_args()
+
+    if nlp_service_v2 is None:
+        print("❌ Set EMBEDDING_V2_MODEL_NAME to the model to migrate to")
+        sys.exit(1)
+    sys.exit(asyncio.run(Reembedder(args).run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Content-addressed storage for uploaded files
+
+Each distinct file is stored once as uploads/<sha256>-<token><ext> and
+tracked in `cdl_mvp.blobs` (keyed by the hash, so unique) with a reference
+count of the documents that point at it. The reference is taken before the
+file is published, and only the release that deletes the record unlinks
+the file. A record re-created after that gets a new token, so a late
+unlink never removes a freshly published copy.
+"""
+import os
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+from services.executors import executors
+
+
+UPLOAD_DIR = "uploads"
+
+
+def blob_path(file_sha256: str, file_ext: str) -> str:
+    return os.path.join(UPLOAD_DIR, f"{file_sha256}-{uuid.uuid4().hex[:12]}{file_ext}")
+
+
+async def acquire_blob(db, temp_path: str, file_sha256: str, file_ext: str, file_size: int) -> str:
+    """Take a reference, then move a freshly written upload into the store"""
+    # With the count above zero no release can delete the record (or its file) now
+    blob = await db.blobs.find_one_and_update(
+        {"_id": file_sha256},
+        {
+            "$inc": {"ref_count": 1},
+            "$setOnInsert": {
+                "file_path": blob_path(file_sha256, file_ext),
+                "file_size": file_size,
+                "created_at": datetime.utcnow()
+            }
+        },
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    path = blob["file_path"]
+    try:
+        # Same hash means same bytes, so replacing an existing copy is harmless and atomic
+        await executors.io.run(os.replace, temp_path, path, admitted=True)
+    except Exception:
+        await release_blob(db, file_sha256)
+        raise
+    return path
+
+
+async def release_blob(db, file_sha256: str) -> Optional[str]:
+    """Drop one reference; delete the file once nothing points at it"""
+    blob = await db.blobs.find_one_and_update(
+        {"_id": file_sha256},
+        {"$inc": {"ref_count": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if blob is None or blob["ref_count"] > 0:
+        return None
+
+    # An acquire may have taken a new reference meanwhile: then it owns the file
+    blob = await db.blobs.find_one_and_delete({"_id": file_sha256, "ref_count": {"$lte": 0}})
+    if blob is None:
+        return None
+    path = blob.get("file_path")
+    if path and os.path.exists(path):
+        try:
+            await executors.io.run(os.remove, path, admitted=True)
+        except Exception as e:
+            print(f"Warning: Could not delete file {path}: {e}")
+    return path
@@ -0,0 +1,234 @@
+"""
+In-process caches used by the search path
+"""
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, List, Optional
+
+import numpy as np
+
+from core.config import settings
+
+
+class LRUCache:
+    """Bounded mapping with least-recently-used eviction and an optional TTL"""
+
+    def __init__(self, max_size: int, ttl_seconds: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class SharedVectorStore:
+    """SQLite table of float32 vectors shared by every worker on the host"""
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._conn = sqlite3.connect(path, timeout=0.05, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB, created REAL)"
+        )
+
+    def get(self, key: str) -> Optional[List[float]]:
+        try:
+            row = self._conn.execute(
+                "SELECT vector, created FROM vectors WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        if row is None:
+            return None
+        if self.ttl_seconds and row[1] + self.ttl_seconds < time.time():
+            return None
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def set(self, key: str, vector: List[float]):
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO vectors (key, vector, created) VALUES (?, ?, ?)",
+                (key, np.asarray(vector, dtype=np.float32).tobytes(), time.time())
+            )
+        except sqlite3.OperationalError as e:
+            # Another worker holds the write lock; the entry is only an optimization
+            print(f"Shared cache write skipped: {e}")
+
+
+def normalize_query(query: str, uncased: bool = True) -> str:
+    """Cache key for a query; case is folded only for models with an uncased tokenizer"""
+    return " ".join((query.lower() if uncased else query).split())
+
+
+class QueryEmbeddingCache:
+    """Query text -> embedding, so repeated searches skip the model"""
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl_seconds: Optional[float] = None,
+        shared_path: Optional[str] = None,
+        uncased: bool = True
+    ):
+        self.local = LRUCache(max_size, ttl_seconds)
+        self.shared = SharedVectorStore(shared_path, ttl_seconds) if shared_path else None
+        self.shared_hits = 0
+        self.uncased = uncased
+
+    def normalize_query(self, query: str) -> str:
+        return normalize_query(query, self.uncased)
+
+    async def get_or_compute(self, query: str, compute: Callable[[str], Awaitable[List[float]]]) -> List[float]:
+        key = self.normalize_query(query)
+
+        embedding = self.local.get(key)
+        if embedding is not None:
+            return embedding
+
+        if self.shared is not None:
+            embedding = self.shared.get(key)
+            if embedding is not None:
+                self.shared_hits += 1
+                self.local.set(key, embedding)
+                return embedding
+
+        # The key only finds the entry: the model always sees the query as typed
+        embedding = await compute(query)
+        self.local.set(key, embedding)
+        if self.shared is not None:
+            self.shared.set(key, embedding)
+        return embedding
+
+    def stats(self) -> dict:
+        stats = self.local.stats()
+        stats["shared_hits"] = self.shared_hits if self.shared is not None else None
+        return stats
+
+
+class CollectionGeneration:
+    """
+    Counter bumped on every document write
+    With a shared path the counter is the size of an append-only file, so a
+    bump from any worker is visible to all of them with a single stat call.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._local = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def current(self) -> int:
+        if not self.path:
+            return self._local
+        try:
+            return os.stat(self.path).st_size
+        except FileNotFoundError:
+            return 0
+
+    def bump(self):
+        self._local += 1
+        if self.path:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, b".")
+            finally:
+                os.close(fd)
+
+
+class SearchResultCache:
+    """Complete /search responses, keyed by (query, limit, filters) and the collection generation"""
+
+    def __init__(self, max_size: int, ttl_seconds: Optional[float] = None, generation_path: Optional[str] = None):
+        self.local = LRUCache(max_size, ttl_seconds)
+        self.generation = CollectionGeneration(generation_path)
+        self._generation_seen = self.generation.current()
+
+    @staticmethod
+    def make_key(query: str, limit: int, filters: Optional[dict] = None, uncased: bool = True) -> tuple:
+        filter_items = tuple(sorted(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in (filters or {}).items()
+            if value is not None
+        ))
+        return (normalize_query(query, uncased), limit, filter_items)
+
+    def current_generation(self) -> int:
+        generation = self.generation.current()
+        if generation != self._generation_seen:
+            # Every cached page predates the write, drop them all at once
+            self.local.clear()
+            self._generation_seen = generation
+        return generation
+
+    def get(self, key: tuple):
+        return self.local.get((key, self.current_generation()))
+
+    def set(self, key: tuple, generation: int, results):
+        if generation == self.current_generation():
+            self.local.set((key, generation), results)
+
+    def invalidate(self):
+        self.generation.bump()
+        self.local.clear()
+
+    def stats(self) -> dict:
+        stats = self.local.stats()
+        stats["generation"] = self.generation.current()
+        return stats
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    settings.QUERY_CACHE_SIZE,
+    settings.QUERY_CACHE_TTL_SECONDS,
+    settings.QUERY_CACHE_SHARED_PATH,
+    uncased=settings.EMBEDDING_MODEL_UNCASED
+)
+
+search_result_cache = SearchResultCache(
+    settings.SEARCH_RESULT_CACHE_SIZE,
+    settings.SEARCH_RESULT_CACHE_TTL_SECONDS,
+    settings.CACHE_GENERATION_PATH
+)
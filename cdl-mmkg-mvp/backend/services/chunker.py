@@ -0,0 +1,33 @@
+"""
+Split long document text into overlapping passages for embedding
+"""
+import re
+from typing import List
+
+from core.config import settings
+
+
+_WORD_RE = re.compile(r"\S+")
+
+
+def split_into_passages(
+    text: str,
+    passage_words: int = settings.CHUNK_WORDS,
+    overlap_words: int = settings.CHUNK_OVERLAP_WORDS
+) -> List[str]:
+    """
+    Split text into windows of `passage_words` words, each sharing
+    `overlap_words` words with the previous one. The default window stays
+    under the 256-token limit of all-MiniLM-L6-v2.
+    """
+    words = _WORD_RE.findall(text or "")
+    if not words:
+        return []
+
+    step = max(1, passage_words - overlap_words)
+    passages = []
+    for start in range(0, len(words), step):
+        passages.append(" ".join(words[start:start + passage_words]))
+        if start + passage_words >= len(words):
+            break
+    return passages
@@ -0,0 +1,213 @@
+"""
+Embedding backends used by NLPService
+
+    sentence-transformers  PyTorch SentenceTransformer.encode (default)
+    onnx                   ONNX Runtime + tokenizers, no torch at runtime;
+                           optionally dynamically int8-quantized
+    sidecar                client of services/embedding_server.py, which runs
+                           one of the above for every worker on the host
+
+ONNX models are exported once with scripts/export_onnx_model.py into
+<ONNX_MODEL_DIR>/<model name>/ (model.onnx, model.int8.onnx, tokenizer.json,
+embedding_config.json). Every backend returns float32 arrays of shape
+(len(texts), dim), normalized the same way as the source model, and names
+the vectors it produces with model_name and revision (the pinned model
+revision plus the runtime, since int8 ONNX vectors differ slightly).
+"""
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+
+
+BACKEND_SENTENCE_TRANSFORMERS = "sentence-transformers"
+BACKEND_ONNX = "onnx"
+BACKEND_SIDECAR = "sidecar"
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_MODEL_FILE = "model.int8.onnx"
+ONNX_CONFIG_FILE = "embedding_config.json"
+TOKENIZER_FILE = "tokenizer.json"
+
+# Sidecar frames: header length, payload length, JSON header, raw payload
+# (requests carry texts in the header, responses float32 rows in the payload)
+FRAME = struct.Struct("!II")
+MAX_FRAME_BYTES = 256 * 1024 * 1024
+
+
+class SentenceTransformerBackend:
+    name = BACKEND_SENTENCE_TRANSFORMERS
+
+    def __init__(self, model_name: str, revision: str = ""):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.revision = f"{revision or 'latest'}:torch"
+        self.model = SentenceTransformer(model_name, revision=revision) if revision else SentenceTransformer(model_name)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+
+class OnnxBackend:
+    name = BACKEND_ONNX
+
+    def __init__(self, model_dir: str, quantized: bool = True, threads: Optional[int] = None):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("EMBEDDING_BACKEND=onnx needs onnxruntime and tokenizers installed") from e
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.model_name = self.config["model_name"]
+        self.revision = f"{self.config.get('revision') or 'latest'}:{'onnx-int8' if quantized else 'onnx-float32'}"
+        self.model_file = os.path.join(model_dir, ONNX_QUANTIZED_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Ingestion workers set OMP_NUM_THREADS so N processes don't oversubscribe the cores
+        options.intra_op_num_threads = threads or int(os.environ.get("OMP_NUM_THREADS", "0"))
+        self.session = onnxruntime.InferenceSession(self.model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.config["max_seq_length"])
+        pad_token = self.config.get("pad_token", "[PAD]")
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        embeddings = np.empty((len(texts), self.config["dim"]), dtype=np.float32)
+        # Batch texts of similar length together so little compute goes to padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self._encode_batch([texts[row] for row in rows])
+        return embeddings
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        inputs = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        token_embeddings = self.session.run(
+            ["last_hidden_state"],
+            {name: value for name, value in inputs.items() if name in self.input_names}
+        )[0]
+
+        # Mean pooling over real tokens, as the sentence-transformers Pooling layer does
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config.get("normalize", True):
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+
+class SidecarBackend:
+    name = BACKEND_SIDECAR
+
+    def __init__(self, socket_path: str, timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        # One connection per thread; the sidecar answers each connection in order
+        self._local = threading.local()
+        # The sidecar may still be starting next to the API: wait for it up to the timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                info = self._request({"op": "info"})[0]
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.5)
+        self.model_name = info["model_name"]
+        self.revision = info["revision"]
+        self.dim = info["dim"]
+        self.remote_backend = info["backend"]
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        # The sidecar picks its own batch size across all workers
+        header, payload = self._request({"op": "encode", "texts": list(texts)})
+        return np.frombuffer(payload, dtype=np.float32).reshape(header["rows"], header["dim"])
+
+    def _request(self, header: dict):
+        for attempt in range(2):
+            sock = self._connection()
+            try:
+                send_frame(sock, header)
+                response, payload = recv_frame(sock)
+                break
+            except socket.timeout:
+                # The request may still be running: drop the connection, don't resend
+                self._local.sock = None
+                sock.close()
+                raise
+            except OSError:
+                # Stale connection (sidecar restarted): reconnect once
+                self._local.sock = None
+                sock.close()
+                if attempt:
+                    raise
+        if "error" in response:
+            raise RuntimeError(f"Embedding sidecar error: {response['error']}")
+        return response, payload
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+
+def send_frame(sock: socket.socket, header: dict, payload: bytes = b""):
+    encoded = json.dumps(header).encode("utf-8")
+    sock.sendall(FRAME.pack(len(encoded), len(payload)) + encoded + payload)
+
+
+def recv_frame(sock: socket.socket):
+    header_size, payload_size = FRAME.unpack(_recv_exactly(sock, FRAME.size))
+    if header_size + payload_size > MAX_FRAME_BYTES:
+        raise ConnectionError("Embedding sidecar frame too large")
+    header = json.loads(_recv_exactly(sock, header_size))
+    return header, _recv_exactly(sock, payload_size)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Embedding sidecar closed the connection")
+        received += count
+    return bytes(buffer)
+
+
+def onnx_model_dir(root: str, model_name: str) -> str:
+    return os.path.join(root, model_name.replace("/", "__"))
+
+
+def create_backend(backend: str, model_name: str, onnx_dir: str, onnx_quantized: bool = True, revision: str = ""):
+    """Instantiate the configured backend (imports its runtime only now)"""
+    if backend == BACKEND_SENTENCE_TRANSFORMERS:
+        return SentenceTransformerBackend(model_name, revision)
+    if backend == BACKEND_ONNX:
+        return OnnxBackend(onnx_model_dir(onnx_dir, model_name), quantized=onnx_quantized)
+    raise ValueError(f"Unknown embedding backend: {backend}")
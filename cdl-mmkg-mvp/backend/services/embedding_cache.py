@@ -0,0 +1,107 @@
+"""
+Persistent embedding cache
+
+Vectors are stored as raw float32 bytes in SQLite, keyed by
+(model name, model revision, sha256 of the exact text embedded), so they
+survive restarts, are shared by every process on the host and never mix
+vectors from two models. The cache is filled by document writes and read
+first by bulk tools and re-embedding jobs, so unchanged text is never
+encoded twice.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+
+# Stay under SQLite's default limit of 999 bound parameters per statement
+LOOKUP_BATCH = 500
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, model_name: str, model_revision: str, timeout: float = 1.0):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.model_name = model_name
+        self.model_revision = model_revision
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, revision TEXT NOT NULL, text_sha256 BLOB NOT NULL,"
+            " vector BLOB NOT NULL, created REAL NOT NULL,"
+            " PRIMARY KEY (model, revision, text_sha256)) WITHOUT ROWID"
+        )
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        return self.get_many([text])[0]
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector for each text, None where missing"""
+        keys = [text_key(text) for text in texts]
+        found = {}
+        try:
+            with self._lock:
+                for start in range(0, len(keys), LOOKUP_BATCH):
+                    batch = keys[start:start + LOOKUP_BATCH]
+                    rows = self._conn.execute(
+                        "SELECT text_sha256, vector FROM embeddings WHERE model = ? AND revision = ?"
+                        f" AND text_sha256 IN ({','.join('?' * len(batch))})",
+                        (self.model_name, self.model_revision, *batch)
+                    ).fetchall()
+                    found.update(rows)
+        except sqlite3.OperationalError as e:
+            print(f"Embedding cache read skipped: {e}")
+
+        vectors = [np.frombuffer(found[key], dtype=np.float32) if key in found else None for key in keys]
+        hits = sum(key in found for key in keys)
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return vectors
+
+    def put_many(self, texts: Sequence[str], vectors):
+        now = time.time()
+        rows = [
+            (self.model_name, self.model_revision, text_key(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN")
+                try:
+                    self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            self.writes += len(rows)
+        except sqlite3.OperationalError as e:
+            # Another process holds the write lock; the entries are only an optimization
+            print(f"Embedding cache write skipped: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "model": f"{self.model_name}@{self.model_revision}",
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
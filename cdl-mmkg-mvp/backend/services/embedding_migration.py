@@ -0,0 +1,165 @@
+"""
+Online migration of document embeddings to a new model
+
+    content_embedding      vectors of EMBEDDING_MODEL_NAME (v1)
+    content_embedding_v2   vectors of EMBEDDING_V2_MODEL_NAME, dual-written by
+                           the API and backfilled by scripts/reembed.py
+
+Progress, the resume checkpoint and the switch flag live in one document of
+the `embedding_migrations` collection. /search keeps reading
+content_embedding until the job has verified 100% coverage and set
+`switched`; every worker then moves to content_embedding_v2 and the v2
+model for queries on its next state refresh, never mixing the two within a
+request. Passages keep their v1 vectors and are skipped after the switch.
+"""
+import time
+from typing import List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from core.config import V1_FIELD, V2_FIELD, V2_MODEL_FIELD, settings
+from services.cache import QueryEmbeddingCache, search_result_cache
+from services.embedding_store import EmbeddingStore
+from services.ingestion_worker import EMBEDDING_TEXT_LIMIT
+from services.nlp_service import nlp_service_v2
+from services.vector_codec import encode_embedding
+from services.vector_index import VectorIndex
+
+
+V2_STORE_NAME = "documents_v2"
+
+MIGRATIONS = "embedding_migrations"
+MIGRATION_ID = V2_FIELD
+
+STATUS_RUNNING = "running"
+STATUS_SWITCHED = "switched"
+
+
+# Local index over content_embedding_v2, fed by the v2 store journal
+vector_index_v2 = VectorIndex(settings.EMBEDDING_V2_DIM)
+
+# Query vectors of the two models must never be served for each other, and the
+# v2 model may be cased, so its keys keep case unless configured otherwise
+query_embedding_cache_v2 = QueryEmbeddingCache(
+    settings.QUERY_CACHE_SIZE,
+    settings.QUERY_CACHE_TTL_SECONDS,
+    f"{settings.QUERY_CACHE_SHARED_PATH}.v2" if settings.QUERY_CACHE_SHARED_PATH else None,
+    uncased=settings.EMBEDDING_V2_UNCASED
+)
+
+
+def v2_store() -> EmbeddingStore:
+    return EmbeddingStore(
+        settings.EMBEDDING_STORE_DIR,
+        name=V2_STORE_NAME,
+        dim=settings.EMBEDDING_V2_DIM,
+        dtype=settings.EMBEDDING_STORE_DTYPE
+    )
+
+
+def pending_filter(model_id: str) -> dict:
+    """Documents searchable today whose v2 vector is missing or from another model"""
+    return {V1_FIELD: {"$ne": None}, V2_MODEL_FIELD: {"$ne": model_id}}
+
+
+def v2_fields(embedding: List[float]) -> dict:
+    """Fields to $set for a v2 vector, in the configured storage format"""
+    return {
+        **encode_embedding(embedding, settings.EMBEDDING_STORAGE_FORMAT, field=V2_FIELD),
+        V2_MODEL_FIELD: nlp_service_v2.model_id
+    }
+
+
+async def embed_v2(content: str) -> Optional[List[float]]:
+    """The v2 vector for a document write, or None when no migration is configured"""
+    if nlp_service_v2 is None:
+        return None
+    return await nlp_service_v2.embed((content or "")[:EMBEDDING_TEXT_LIMIT], cached=True)
+
+
+async def load_v2_index(collection) -> Optional[str]:
+    """Map (or load from MongoDB) the v2 index when a migration is configured"""
+    if nlp_service_v2 is None:
+        return None
+    store = v2_store()
+    if vector_index_v2.attach(store):
+        return f"mapped from {store.root} ({len(vector_index_v2)} documents)"
+    indexed = await vector_index_v2.load(collection, field=V2_FIELD)
+    return f"loaded {indexed} documents from MongoDB"
+
+
+async def get_migration(db) -> Optional[dict]:
+    return await db[MIGRATIONS].find_one({"_id": MIGRATION_ID})
+
+
+async def start_migration(db, model_id: str, restart: bool = False) -> dict:
+    """Create the migration document, or return the existing one to resume it"""
+    now = time.time()
+    if restart:
+        await db[MIGRATIONS].delete_one({"_id": MIGRATION_ID})
+    return await db[MIGRATIONS].find_one_and_update(
+        {"_id": MIGRATION_ID},
+        {"$setOnInsert": {
+            "model": model_id,
+            "status": STATUS_RUNNING,
+            "switched": False,
+            "checkpoint": None,
+            "processed": 0,
+            "started_at": now,
+            "updated_at": now
+        }},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def record_progress(db, processed: int, checkpoint=None, **fields):
+    update = {"$set": {"updated_at": time.time(), **fields}, "$inc": {"processed": processed}}
+    if checkpoint is not None:
+        update["$set"]["checkpoint"] = checkpoint
+    await db[MIGRATIONS].update_one({"_id": MIGRATION_ID}, update)
+
+
+async def switch_over(db) -> bool:
+    """Flip every worker to content_embedding_v2 (a single-document write)"""
+    result = await db[MIGRATIONS].update_one(
+        {"_id": MIGRATION_ID, "switched": False},
+        {"$set": {"switched": True, "status": STATUS_SWITCHED, "switched_at": time.time()}}
+    )
+    return result.modified_count == 1
+
+
+class ActiveEmbedding:
+    """The embedding field /search reads, refreshed from the migration document"""
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.field = V1_FIELD
+        self._checked_at = None
+
+    async def current(self, db) -> str:
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.refresh_seconds:
+            return self.field
+        self._checked_at = now
+
+        try:
+            state = await db[MIGRATIONS].find_one({"_id": MIGRATION_ID}, {"switched": 1})
+        except PyMongoError as e:
+            print(f"Embedding migration state not available: {e}")
+            return self.field
+
+        switched = bool(state and state.get("switched"))
+        if switched and nlp_service_v2 is None:
+            print("⚠️  Embedding migration switched, but EMBEDDING_V2_MODEL_NAME is not set on this worker")
+        field = V2_FIELD if switched and nlp_service_v2 is not None else V1_FIELD
+        if field != self.field:
+            # Cached pages were ranked with the other model
+            search_result_cache.local.clear()
+            print(f"✅ /search now reads {field}")
+            self.field = field
+        return field
+
+
+active_embedding = ActiveEmbedding(settings.EMBEDDING_FIELD_REFRESH_SECONDS)
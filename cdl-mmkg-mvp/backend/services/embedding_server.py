@@ -0,0 +1,192 @@
+"""
+Shared embedding sidecar for multi-worker deployments
+
+    python -m services.embedding_server --socket /tmp/cdl-embedding.sock
+
+Loads the configured backend (EMBEDDING_BACKEND) once per host and serves
+it on a Unix socket. API workers and ingestion processes started with
+EMBEDDING_SIDECAR_SOCKET set become thin clients (SidecarBackend), so
+torch and the model are no longer held in memory N times. Requests from all
+workers are grouped into batches of up to EMBEDDING_SIDECAR_MAX_BATCH texts,
+encoded on one thread that uses every core.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from core.config import settings
+from services.embedding_backends import FRAME, MAX_FRAME_BYTES, create_backend
+
+DEFAULT_SOCKET = "/tmp/cdl-embedding.sock"
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    header_size, payload_size = FRAME.unpack(await reader.readexactly(FRAME.size))
+    if header_size + payload_size > MAX_FRAME_BYTES:
+        raise ConnectionError("Frame too large")
+    header = json.loads(await reader.readexactly(header_size))
+    payload = await reader.readexactly(payload_size)
+    return header, payload
+
+
+async def write_frame(writer: asyncio.StreamWriter, header: dict, payload: bytes = b""):
+    encoded = json.dumps(header).encode("utf-8")
+    writer.write(FRAME.pack(len(encoded), len(payload)) + encoded + payload)
+    await writer.drain()
+
+
+class EmbeddingServer:
+    def __init__(self, backend, max_batch: int, max_wait_ms: float):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        # One encode at a time: the backend itself spreads each batch over all cores
+        self.encoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encode")
+        self._queue: asyncio.Queue = None
+        self.dim = None
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "avg_batch": round(self.texts / self.batches, 1) if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0
+        }
+
+    async def serve(self, socket_path: str):
+        self.dim = self.backend.encode(["warm up"]).shape[1]
+        self._queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batch_worker())
+
+        # A stale socket file from a previous run would make bind() fail
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(self._handle, path=socket_path)
+        os.chmod(socket_path, 0o660)
+        print(f"✅ Embedding sidecar serving {self.backend.model_name} ({self.backend.name}) on {socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            self.encoder.shutdown(wait=False, cancel_futures=True)
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    header, _ = await read_frame(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                op = header.get("op")
+                if op == "info":
+                    await write_frame(writer, {
+                        "model_name": self.backend.model_name,
+                        "revision": self.backend.revision,
+                        "backend": self.backend.name,
+                        "dim": self.dim,
+                        **self.stats()
+                    })
+                elif op == "encode":
+                    try:
+                        embeddings = await self.encode(header.get("texts") or [])
+                    except Exception as e:
+                        await write_frame(writer, {"error": str(e)})
+                        continue
+                    await write_frame(
+                        writer,
+                        {"rows": len(embeddings), "dim": self.dim},
+                        np.ascontiguousarray(embeddings, dtype=np.float32).tobytes()
+                    )
+                else:
+                    await write_frame(writer, {"error": f"Unknown op: {op}"})
+        finally:
+            writer.close()
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        self.requests += 1
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((texts, future))
+        return await future
+
+    async def _batch_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+
+            # Wait a few milliseconds for other workers' requests unless the batch is already full
+            if size < self.max_batch and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+            while size < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                batch.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                embeddings = await loop.run_in_executor(
+                    self.encoder, self.backend.encode, texts, self.max_batch
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts += len(texts)
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(embeddings[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=settings.EMBEDDING_SIDECAR_SOCKET or DEFAULT_SOCKET)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="Intra-op threads for the model")
+    parser.add_argument("--max-batch", type=int, default=settings.EMBEDDING_SIDECAR_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=settings.EMBEDDING_BATCH_MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    # Before the backend loads, so torch / onnxruntime size their thread pools from it
+    os.environ["OMP_NUM_THREADS"] = str(args.threads)
+    Path(args.socket).parent.mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    backend = create_backend(
+        settings.EMBEDDING_BACKEND,
+        settings.EMBEDDING_MODEL_NAME,
+        settings.ONNX_MODEL_DIR,
+        settings.ONNX_QUANTIZED,
+        settings.EMBEDDING_MODEL_REVISION
+    )
+    print(f"✅ Embedding model {settings.EMBEDDING_MODEL_NAME} ({backend.name}) loaded in {time.perf_counter() - started:.1f}s")
+
+    server = EmbeddingServer(backend, args.max_batch, args.max_wait_ms)
+    try:
+        asyncio.run(server.serve(args.socket))
+    except KeyboardInterrupt:
+        print("🛑 Embedding sidecar stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Persisted sidecar storage for the in-process vector index
+
+Layout under EMBEDDING_STORE_DIR/<name>/:
+    CURRENT                 name of the active snapshot directory
+    snapshot-<ts>/meta.json row count, dimension and dtype
+    snapshot-<ts>/ids.npy   sorted fixed-width keys (one per row)
+    snapshot-<ts>/vectors   raw row-major matrix (float32, float16 or int8), opened with np.memmap
+    snapshot-<ts>/scales    int8 only: float32 per-row scale (max |component| / 127)
+    journal                 fixed-size upsert/delete records since the snapshot
+
+Snapshots are immutable and memory-mapped read-only, so every uvicorn
+worker shares the same pages through the OS page cache. Writes from any
+worker are appended to the journal, which the other workers tail.
+"""
+import json
+import os
+import shutil
+import time
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+
+KEY_WIDTH = 32
+OP_UPSERT = b"U"
+OP_DELETE = b"D"
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+# int8 rows use the full [-127, 127] range: row * scale restores the vector.
+# Snapshots written before per-row scales divide every row by INT8_SCALE.
+INT8_SCALE = 127.0
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """int8 rows and their float32 scales (max |component| / 127 per row)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    max_abs = np.abs(vectors).max(axis=1) if vectors.size else np.zeros(len(vectors), dtype=np.float32)
+    scales = np.where(max_abs > 0, max_abs / INT8_SCALE, 1.0).astype(np.float32)
+    rows = np.clip(np.round(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return rows, scales
+
+
+class Snapshot:
+    def __init__(self, path: str, ids: np.ndarray, vectors: np.ndarray, scales: Optional[np.ndarray] = None):
+        self.path = path
+        self.ids = ids
+        self.vectors = vectors
+        self.scales = scales
+
+    def __len__(self) -> int:
+        return self.ids.shape[0]
+
+
+class EmbeddingStore:
+    def __init__(self, directory: str, name: str = "documents", dim: int = 384, dtype: str = "float32"):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported embedding store dtype: {dtype}")
+        self.root = os.path.join(directory, name)
+        self.dim = dim
+        self.dtype = dtype
+        self.record_dtype = np.dtype([
+            ("op", "S1"),
+            ("key", f"S{KEY_WIDTH}"),
+            ("vector", "<f4", (dim,))
+        ])
+        self._snapshot_stamp = None
+        self._journal_stamp = None
+        self._journal_offset = 0
+
+    @property
+    def current_path(self) -> str:
+        return os.path.join(self.root, "CURRENT")
+
+    @property
+    def journal_path(self) -> str:
+        return os.path.join(self.root, "journal")
+
+    @staticmethod
+    def _stamp(path: str):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.current_path)
+
+    def open_snapshot(self) -> Optional[Snapshot]:
+        """Memory-map the active snapshot (no copy, no Mongo scan)"""
+        self._snapshot_stamp = self._stamp(self.current_path)
+        if self._snapshot_stamp is None:
+            return None
+
+        with open(self.current_path, "r", encoding="utf-8") as f:
+            snapshot_dir = os.path.join(self.root, f.read().strip())
+        with open(os.path.join(snapshot_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        count, dim = meta["count"], meta["dim"]
+        if dim != self.dim:
+            raise ValueError(f"Embedding store has dimension {dim}, expected {self.dim}")
+
+        ids = np.load(os.path.join(snapshot_dir, "ids.npy"), mmap_mode="r")
+        scales = None
+        if count:
+            vectors = np.memmap(
+                os.path.join(snapshot_dir, "vectors"),
+                dtype=meta["dtype"], mode="r", shape=(count, dim)
+            )
+            if meta.get("row_scales"):
+                scales = np.memmap(os.path.join(snapshot_dir, "scales"), dtype=np.float32, mode="r", shape=(count,))
+        else:
+            vectors = np.zeros((0, dim), dtype=meta["dtype"])
+            if meta.get("row_scales"):
+                scales = np.zeros(0, dtype=np.float32)
+        return Snapshot(snapshot_dir, ids, vectors, scales)
+
+    def snapshot_changed(self) -> bool:
+        return self._stamp(self.current_path) != self._snapshot_stamp
+
+    def append(self, op: bytes, key: str, vector: Optional[np.ndarray] = None):
+        """Append one record to the journal (single O_APPEND write)"""
+        record = np.zeros(1, dtype=self.record_dtype)
+        record["op"] = op
+        record["key"] = key.encode("ascii")
+        if vector is not None:
+            record["vector"][0] = vector
+
+        os.makedirs(self.root, exist_ok=True)
+        fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, record.tobytes())
+        finally:
+            os.close(fd)
+
+    def read_journal(self, from_start: bool = False) -> Iterator[Tuple[bytes, str, np.ndarray]]:
+        """Yield journal records not seen yet by this process"""
+        stamp = self._stamp(self.journal_path)
+        if from_start or stamp is None or self._journal_stamp is None or stamp[0] != self._journal_stamp[0]:
+            # Journal was rotated by a compaction (or first read): start over
+            self._journal_offset = 0
+        self._journal_stamp = stamp
+        if stamp is None:
+            return
+
+        size = os.path.getsize(self.journal_path)
+        record_size = self.record_dtype.itemsize
+        count = (size - self._journal_offset) // record_size
+        if count <= 0:
+            return
+
+        records = np.fromfile(
+            self.journal_path, dtype=self.record_dtype, count=count, offset=self._journal_offset
+        )
+        self._journal_offset += count * record_size
+        for record in records:
+            yield record["op"], record["key"].decode("ascii"), record["vector"]
+
+    def skip_journal(self):
+        """Mark the current journal contents as already applied"""
+        self._journal_stamp = self._stamp(self.journal_path)
+        self._journal_offset = os.path.getsize(self.journal_path) if self._journal_stamp else 0
+
+    def rotate_journal(self) -> Optional[str]:
+        """Move the live journal aside so new writes start a fresh one"""
+        if not os.path.exists(self.journal_path):
+            return None
+        rotated = f"{self.journal_path}.{time.time_ns()}.compacting"
+        os.replace(self.journal_path, rotated)
+        return rotated
+
+    def iter_journal_file(self, path: str) -> Iterator[Tuple[bytes, str, np.ndarray]]:
+        for record in np.fromfile(path, dtype=self.record_dtype):
+            yield record["op"], record["key"].decode("ascii"), record["vector"]
+
+    def create_snapshot_writer(self) -> "SnapshotWriter":
+        return SnapshotWriter(self)
+
+    def publish(self, snapshot_name: str):
+        """Atomically point CURRENT at a finished snapshot and prune old ones"""
+        tmp = f"{self.current_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(snapshot_name)
+        os.replace(tmp, self.current_path)
+
+        # Workers that still map an old snapshot keep their pages until they reload
+        for entry in os.listdir(self.root):
+            if entry.startswith("snapshot-") and entry != snapshot_name:
+                shutil.rmtree(os.path.join(self.root, entry), ignore_errors=True)
+
+
+class SnapshotWriter:
+    """Stream sorted (key, vector) rows into a new snapshot directory"""
+
+    def __init__(self, store: EmbeddingStore):
+        self.store = store
+        self.name = f"snapshot-{time.time_ns()}"
+        self.path = os.path.join(store.root, self.name)
+        os.makedirs(self.path, exist_ok=True)
+        self._vectors = open(os.path.join(self.path, "vectors"), "wb")
+        self._scales = open(os.path.join(self.path, "scales"), "wb") if store.dtype == "int8" else None
+        self._ids = []
+        self._last_key = None
+
+    def write(self, keys, vectors: np.ndarray):
+        for key in keys:
+            if self._last_key is not None and key <= self._last_key:
+                raise ValueError("Snapshot keys must be written in strictly increasing order")
+            self._last_key = key
+        self._ids.extend(keys)
+        if self._scales is not None:
+            # Unit vectors have small components: a per-row scale keeps the full int8 range
+            vectors, scales = quantize_int8(vectors)
+            self._scales.write(scales.tobytes())
+        self._vectors.write(np.ascontiguousarray(vectors, dtype=self.store.dtype).tobytes())
+
+    def _close(self):
+        self._vectors.close()
+        if self._scales is not None:
+            self._scales.close()
+
+    def commit(self) -> int:
+        self._close()
+        np.save(os.path.join(self.path, "ids.npy"), np.array(self._ids, dtype=f"S{KEY_WIDTH}"))
+        meta = {"count": len(self._ids), "dim": self.store.dim, "dtype": self.store.dtype}
+        if self._scales is not None:
+            meta["row_scales"] = True
+        with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        self.store.publish(self.name)
+        return len(self._ids)
+
+    def abort(self):
+        self._close()
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,130 @@
+"""
+Bounded executors for work that must not run on the event loop
+
+    inference   threads    model encode calls (torch releases the GIL)
+    extraction  processes  PDF/DOCX text extraction and embedding of uploads
+    io          threads    blocking filesystem calls
+
+Each pool admits at most `workers + max_queue` tasks; beyond that callers
+get ExecutorSaturated, which the API turns into 429 so overload shows up as
+fast rejections instead of every request slowing down.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from core.config import settings
+from services.ingestion_worker import init_worker
+
+
+class ExecutorSaturated(Exception):
+    def __init__(self, name: str):
+        super().__init__(f"The {name} queue is full, retry later")
+        self.name = name
+
+
+class BoundedExecutor:
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        max_queue: int,
+        processes: bool = False,
+        initializer: Optional[Callable] = None,
+        initargs: tuple = ()
+    ):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.processes = processes
+        self.initializer = initializer
+        self.initargs = initargs
+        self._pool: Optional[Executor] = None
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def pool(self) -> Executor:
+        # Created on first use, so importing this module never spawns anything
+        if self._pool is None:
+            if self.processes:
+                # Spawned, so workers never inherit a loaded model or open sockets
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=self.initializer,
+                    initargs=self.initargs
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+        return self._pool
+
+    def check(self, backlog: int = 0):
+        """Raise ExecutorSaturated if no more work can be admitted (backlog: work queued in front of the pool)"""
+        if self.pending + backlog >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise ExecutorSaturated(self.name)
+
+    async def run(self, fn: Callable, *args, admitted: bool = False):
+        """
+        Run fn(*args) in the pool and await its result
+        Pass admitted=True for work accepted earlier (after a check()), so it
+        is never rejected halfway through a request.
+        """
+        if not admitted:
+            self.check()
+        self.pending += 1
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": min(self.pending, self.workers),
+            "queued": max(0, self.pending - self.workers),
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class Executors:
+    def __init__(self):
+        self.inference = BoundedExecutor("inference", settings.INFERENCE_THREADS, settings.INFERENCE_QUEUE_SIZE)
+        self.extraction = BoundedExecutor(
+            "extraction",
+            settings.INGEST_WORKERS,
+            settings.EXTRACTION_QUEUE_SIZE,
+            processes=True,
+            initializer=init_worker,
+            # Limit intra-op threads so N workers don't oversubscribe the cores
+            initargs=(max(1, (os.cpu_count() or 1) // settings.INGEST_WORKERS),)
+        )
+        self.io = BoundedExecutor("io", settings.IO_THREADS, settings.IO_QUEUE_SIZE)
+
+    def stats(self) -> dict:
+        return {pool.name: pool.stats() for pool in (self.inference, self.extraction, self.io)}
+
+    def shutdown(self):
+        for pool in (self.inference, self.extraction, self.io):
+            pool.shutdown()
+
+
+executors = Executors()
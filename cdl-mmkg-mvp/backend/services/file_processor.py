@@ -1,26 +1,102 @@
 """
 Service for extracting text from various file formats
 """
+import hashlib
+import multiprocessing
 import os
-from typing import Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
 
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from PDF file using PyPDF2"""
+# Below this many pages, spawning workers costs more than it saves
+PDF_PARALLEL_MIN_PAGES = 64
+PDF_PAGES_PER_TASK = 16
+
+
+def iter_pdf_pages(file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+    """Yield the text of each page in [start, stop) one at a time"""
     try:
         from PyPDF2 import PdfReader
+    except ImportError:
+        raise ImportError("PyPDF2 is not installed. Install it with: pip install PyPDF2")
+    
+    reader = PdfReader(file_path)
+    for page in reader.pages[start:stop]:
+        page_text = page.extract_text()
+        if page_text:
+            yield page_text
+
+
+def _extract_pdf_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Worker-process entry point for one page range"""
+    return list(iter_pdf_pages(file_path, start, stop))
+
+
+def _iter_pdf_pages_parallel(file_path: str, page_count: int, workers: int) -> Iterator[str]:
+    """
+    Fan page ranges out over a process pool, yielding pages in document order
+    At most `workers` ranges are in flight, so only that many ranges of page
+    text are held in memory however long the PDF is.
+    """
+    ranges = (
+        (start, min(start + PDF_PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PDF_PAGES_PER_TASK)
+    )
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = deque()
+
+        def submit_next():
+            page_range = next(ranges, None)
+            if page_range is not None:
+                futures.append(pool.submit(_extract_pdf_range, file_path, *page_range))
+
+        for _ in range(workers):
+            submit_next()
+        try:
+            while futures:
+                pages = futures.popleft().result()
+                # Keep the pool busy while the consumer reads this range
+                submit_next()
+                yield from pages
+        finally:
+            # Early exit from the consumer: drop the ranges nobody will read
+            for future in futures:
+                future.cancel()
+
+
+def extract_text_from_pdf(file_path: str, max_chars: Optional[int] = None, workers: int = 1) -> str:
+    """
+    Extract text from PDF file using PyPDF2
+    Pages are streamed and joined once at the end; extraction stops as soon
+    as `max_chars` characters are collected. Large PDFs are split by page
+    range across `workers` processes.
+    """
+    try:
+        if workers > 1:
+            from PyPDF2 import PdfReader
+            page_count = len(PdfReader(file_path).pages)
+        else:
+            page_count = 0
         
-        reader = PdfReader(file_path)
-        text = ""
+        if workers > 1 and page_count >= PDF_PARALLEL_MIN_PAGES:
+            pages = _iter_pdf_pages_parallel(file_path, page_count, workers)
+        else:
+            pages = iter_pdf_pages(file_path)
         
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n\n"
+        parts = []
+        collected = 0
+        for page_text in pages:
+            parts.append(page_text)
+            collected += len(page_text) + 2
+            if max_chars is not None and collected >= max_chars:
+                pages.close()
+                break
         
-        return text.strip()
+        text = "\n\n".join(parts).strip()
+        return text[:max_chars] if max_chars is not None else text
     except ImportError:
-        raise ImportError("PyPDF2 is not installed. Install it with: pip install PyPDF2")
+        raise
     except Exception as e:
         raise Exception(f"Failed to extract PDF text: {str(e)}")
 
@@ -52,10 +128,11 @@ def extract_text_from_docx(file_path: str) -> str:
         raise Exception(f"Failed to extract DOCX text: {str(e)}")
 
 
-def extract_text_from_file(file_path: str) -> Optional[str]:
+def extract_text_from_file(file_path: str, max_chars: Optional[int] = None, workers: int = 1) -> Optional[str]:
     """
     Extract text from a file based on its extension
     Supports: .pdf, .docx, .txt
+    `max_chars` caps the returned text, `workers` enables page-parallel PDF extraction
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
@@ -64,10 +141,17 @@ def extract_text_from_file(file_path: str) -> Optional[str]:
     
     if file_ext == ".txt":
         with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read()
+            return f.read(max_chars) if max_chars is not None else f.read()
     elif file_ext == ".pdf":
-        return extract_text_from_pdf(file_path)
+        return extract_text_from_pdf(file_path, max_chars=max_chars, workers=workers)
     elif file_ext in [".docx", ".doc"]:
-        return extract_text_from_docx(file_path)
+        text = extract_text_from_docx(file_path)
+        return text[:max_chars] if max_chars is not None else text
     else:
         raise ValueError(f"Unsupported file type: {file_ext}")
+
+
+def compute_content_hash(text: str) -> str:
+    """SHA-256 of the text with whitespace collapsed, used to spot duplicate documents"""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
@@ -0,0 +1,294 @@
+"""
+Background ingestion of uploaded files
+
+Uploads are recorded as jobs in `cdl_mvp.ingest_jobs` and processed in the
+extraction process pool (text extraction + embedding), so the upload
+request returns immediately and throughput scales with the number of cores.
+Each job is claimed atomically by one API worker under a lease that the
+worker renews while the job runs, so a job is never processed twice; a
+crashed worker's jobs are recovered once their lease expires.
+"""
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from core.config import CONTENT_PRIMARY_FIELD, settings
+from services.cache import search_result_cache
+from services.blob_store import release_blob
+from services.embedding_migration import embed_v2, v2_fields, vector_index_v2
+from services.executors import executors
+from services.ingestion_worker import embed_content, extract_file
+from services.passage_index import copy_passages, index_passages, store_passages
+from services.vector_codec import decode_embedding, embedding_projection, encode_embedding
+from services.vector_index import vector_index
+
+
+JOB_QUEUED = "queued"
+JOB_PROCESSING = "processing"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+# Fields a duplicate document inherits from the document it duplicates
+REUSED_FIELDS = {"_id": 1, "content": 1, "content_hash": 1, "embedding_model": 1, **embedding_projection()}
+
+
+async def find_duplicate(db, content_hash: Optional[str] = None, file_sha256: Optional[str] = None) -> Optional[dict]:
+    """Find an existing document with the same file or the same normalized text"""
+    has_embedding = {"content_embedding": {"$ne": None}}
+    if file_sha256:
+        duplicate = await db[settings.COLLECTION_NAME].find_one({"metadata.file_sha256": file_sha256, **has_embedding}, REUSED_FIELDS)
+        if duplicate:
+            return duplicate
+    if content_hash:
+        return await db[settings.COLLECTION_NAME].find_one({"content_hash": content_hash, **has_embedding}, REUSED_FIELDS)
+    return None
+
+
+async def insert_document(
+    db,
+    document_dict: dict,
+    passages: Optional[List[str]] = None,
+    passage_embeddings: Optional[list] = None,
+    duplicate_of: Optional[ObjectId] = None
+) -> ObjectId:
+    """
+    Insert a document and bring the vector indexes and caches up to date
+    `content_embedding` is given as a vector and stored in the configured
+    format. Passages are copied from `duplicate_of`, stored from precomputed
+    embeddings, or chunked and embedded here, in that order of preference.
+    During a model migration content_embedding_v2 is written as well.
+
+    A document with new text is stored as the primary for its content_hash.
+    If a concurrent upload of the same text got there first, this one is
+    stored as its duplicate and takes over the primary's vector.
+    """
+    embedding = document_dict.pop("content_embedding")
+    if duplicate_of is None and document_dict.get("content_hash"):
+        document_dict[CONTENT_PRIMARY_FIELD] = True
+    document_dict.update(encode_embedding(embedding, settings.EMBEDDING_STORAGE_FORMAT))
+    embedding_v2 = await embed_v2(document_dict["content"])
+    if embedding_v2 is not None:
+        document_dict.update(v2_fields(embedding_v2))
+    try:
+        result = await db[settings.COLLECTION_NAME].insert_one(document_dict)
+    except DuplicateKeyError:
+        primary = await find_duplicate(db, content_hash=document_dict.get("content_hash"))
+        if not document_dict.pop(CONTENT_PRIMARY_FIELD, False) or primary is None:
+            raise
+        # Same text, so the vectors match the primary's: keep the index consistent with it.
+        # Passages are still built here, as the primary may not have stored its own yet.
+        embedding = decode_embedding(primary)
+        document_dict.update(encode_embedding(embedding, settings.EMBEDDING_STORAGE_FORMAT))
+        document_dict["embedding_model"] = primary.get("embedding_model")
+        result = await db[settings.COLLECTION_NAME].insert_one(document_dict)
+    vector_index.upsert(str(result.inserted_id), embedding)
+    if embedding_v2 is not None:
+        vector_index_v2.upsert(str(result.inserted_id), embedding_v2)
+
+    if duplicate_of is not None:
+        await copy_passages(db.chunks, duplicate_of, result.inserted_id)
+    elif passages is None:
+        await index_passages(db.chunks, result.inserted_id, document_dict["content"])
+    else:
+        await store_passages(db.chunks, result.inserted_id, passages, passage_embeddings)
+
+    search_result_cache.invalidate()
+    return result.inserted_id
+
+
+class IngestionQueue:
+    def __init__(self):
+        self.db = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease = timedelta(seconds=settings.INGEST_JOB_LEASE_SECONDS)
+        self._tasks = set()
+        self._recovery = None
+
+    def start(self, db):
+        """Jobs run in the shared extraction pool (services/executors.py)"""
+        self.db = db
+
+    def check_capacity(self):
+        """Raise ExecutorSaturated when the extraction pool cannot take another upload"""
+        executors.extraction.check()
+
+    def _claimable(self) -> dict:
+        """Queued jobs, and running jobs whose worker stopped renewing the lease"""
+        return {"$or": [
+            {"status": JOB_QUEUED},
+            {"status": JOB_PROCESSING, "lease_until": {"$lt": datetime.utcnow()}},
+            {"status": JOB_PROCESSING, "lease_until": None}
+        ]}
+
+    async def resume(self) -> int:
+        """Re-run jobs left unfinished by a previous shutdown or a crashed worker"""
+        if self._recovery is None:
+            self._recovery = asyncio.create_task(self._recover_periodically())
+        jobs = await self.db.ingest_jobs.find(self._claimable()).to_list(length=None)
+        for job in jobs:
+            # Every worker schedules these at startup; _claim lets only one run each
+            self._schedule(job)
+        return len(jobs)
+
+    async def _recover_periodically(self):
+        while True:
+            await asyncio.sleep(self.lease.total_seconds())
+            try:
+                await self.resume()
+            except Exception as e:
+                print(f"Ingestion job recovery failed: {e}")
+
+    async def submit(self, file_path: str, document_fields: dict) -> dict:
+        """
+        Record a job for an uploaded file and schedule it
+        A file that was uploaded before is completed right away by reusing
+        the existing extraction, embedding and passages.
+        """
+        now = datetime.utcnow()
+        job = {
+            "status": JOB_QUEUED,
+            "file_path": file_path,
+            "document": document_fields,
+            "document_id": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now
+        }
+
+        duplicate = await find_duplicate(self.db, file_sha256=document_fields["metadata"].get("file_sha256"))
+        if duplicate:
+            job["document_id"] = await self._insert_duplicate(job, duplicate)
+            job["status"] = JOB_DONE
+
+        result = await self.db.ingest_jobs.insert_one(job)
+        job["_id"] = result.inserted_id
+        if job["status"] == JOB_QUEUED:
+            self._schedule(job)
+        return job
+
+    async def _insert_duplicate(self, job: dict, duplicate: dict, document_id: Optional[ObjectId] = None) -> ObjectId:
+        document_dict = {
+            "_id": document_id or ObjectId(),
+            **job["document"],
+            "content": duplicate["content"],
+            "content_hash": duplicate.get("content_hash"),
+            "file_path": job["file_path"],
+            "upload_date": datetime.utcnow(),
+            "content_embedding": decode_embedding(duplicate),
+            "embedding_model": duplicate.get("embedding_model")
+        }
+        return await insert_document(self.db, document_dict, duplicate_of=duplicate["_id"])
+
+    async def get(self, job_id: ObjectId) -> Optional[dict]:
+        return await self.db.ingest_jobs.find_one({"_id": job_id})
+
+    def _schedule(self, job: dict):
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _claim(self, job_id: ObjectId) -> Optional[dict]:
+        """Atomically take a job for this worker, or None if another worker has it"""
+        now = datetime.utcnow()
+        return await self.db.ingest_jobs.find_one_and_update(
+            {"_id": job_id, **self._claimable()},
+            {"$set": {
+                "status": JOB_PROCESSING,
+                "worker": self.worker_id,
+                "lease_until": now + self.lease,
+                "updated_at": now
+            }}
+        )
+
+    async def _renew_lease(self, job_id: ObjectId):
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            await self.db.ingest_jobs.update_one(
+                {"_id": job_id, "worker": self.worker_id, "status": JOB_PROCESSING},
+                {"$set": {"lease_until": datetime.utcnow() + self.lease}}
+            )
+
+    async def _set_status(self, job_id: ObjectId, status: str, **fields):
+        await self.db.ingest_jobs.update_one(
+            {"_id": job_id, "worker": self.worker_id},
+            {"$set": {"status": status, "lease_until": None, "updated_at": datetime.utcnow(), **fields}}
+        )
+
+    async def _run(self, job: dict):
+        job_id = job["_id"]
+        if await self._claim(job_id) is None:
+            return
+
+        renewal = asyncio.create_task(self._renew_lease(job_id))
+        try:
+            await self._process(job)
+        except asyncio.CancelledError:
+            # Shutdown: hand the job back instead of waiting for the lease to expire
+            await self._set_status(job_id, JOB_QUEUED)
+            raise
+        finally:
+            renewal.cancel()
+
+    async def _process(self, job: dict):
+        job_id = job["_id"]
+        file_path = job["file_path"]
+        # Chosen up front so a failure can tell whether the document was written
+        document_id = ObjectId()
+        try:
+            # Jobs were admitted at upload time (or before a restart), never reject them here
+            extracted = await executors.extraction.run(extract_file, file_path, admitted=True)
+
+            # Same text under a different file: skip the model entirely
+            duplicate = await find_duplicate(self.db, content_hash=extracted["content_hash"])
+            if duplicate:
+                await self._insert_duplicate(job, duplicate, document_id)
+            else:
+                processed = await executors.extraction.run(embed_content, extracted["content"], admitted=True)
+                document_dict = {
+                    "_id": document_id,
+                    **job["document"],
+                    "content": extracted["content"],
+                    "content_hash": extracted["content_hash"],
+                    "file_path": file_path,
+                    "upload_date": datetime.utcnow(),
+                    "content_embedding": processed["embedding"],
+                    "embedding_model": processed["embedding_model"]
+                }
+                await insert_document(
+                    self.db, document_dict, processed["passages"], processed["passage_embeddings"]
+                )
+        except Exception as e:
+            print(f"Ingestion job {job_id} failed: {e}")
+            # A document inserted before the failure (e.g. in passage indexing) still holds the file
+            inserted = await self.db[settings.COLLECTION_NAME].find_one({"_id": document_id}, {"_id": 1})
+            if inserted is None:
+                await self._release_file(job)
+            await self._set_status(job_id, JOB_FAILED, error=str(e), document_id=document_id if inserted else None)
+            return
+
+        await self._set_status(job_id, JOB_DONE, document_id=document_id)
+
+    async def _release_file(self, job: dict):
+        file_sha256 = job["document"].get("metadata", {}).get("file_sha256")
+        if file_sha256:
+            await release_blob(self.db, file_sha256)
+        elif os.path.exists(job["file_path"]):
+            await executors.io.run(os.remove, job["file_path"], admitted=True)
+
+    async def close(self):
+        if self._recovery is not None:
+            self._recovery.cancel()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,57 @@
+"""
+Code that runs inside the ingestion worker processes
+
+Kept free of database and API imports so that spawning a worker only
+pays for text extraction and the embedding model.
+"""
+import os
+
+
+MIN_CONTENT_LENGTH = 10
+EMBEDDING_TEXT_LIMIT = 5000
+
+
+def init_worker(threads: int):
+    """Limit intra-op threads so N workers don't oversubscribe the cores"""
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    from core.config import settings
+    if settings.EMBEDDING_SIDECAR_SOCKET or settings.EMBEDDING_BACKEND != "sentence-transformers":
+        # No torch in this process at all
+        return
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def extract_file(file_path: str) -> dict:
+    """Extract the text of one uploaded file"""
+    from core.config import settings
+    from services.file_processor import compute_content_hash, extract_text_from_file
+
+    content = extract_text_from_file(
+        file_path,
+        max_chars=settings.MAX_EXTRACT_CHARS,
+        workers=settings.PDF_EXTRACT_WORKERS
+    )
+    if not content or len(content.strip()) < MIN_CONTENT_LENGTH:
+        raise ValueError("No readable content found in file")
+
+    return {"content": content, "content_hash": compute_content_hash(content)}
+
+
+def embed_content(content: str) -> dict:
+    """Chunk and embed extracted text"""
+    from services.chunker import split_into_passages
+    from services.nlp_service import nlp_service
+
+    passages = split_into_passages(content)
+    embeddings = nlp_service.generate_embeddings([content[:EMBEDDING_TEXT_LIMIT]] + passages, cached=True)
+
+    return {
+        "embedding": embeddings[0],
+        "embedding_model": nlp_service.model_id,
+        "passages": passages,
+        "passage_embeddings": embeddings[1:]
+    }
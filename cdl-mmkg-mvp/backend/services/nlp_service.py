@@ -1,13 +1,194 @@
-from sentence_transformers import SentenceTransformer
+import asyncio
+import threading
+import time
+from typing import List, Optional
+
+from core.config import settings
+from services.embedding_backends import SidecarBackend, create_backend
+from services.embedding_cache import EmbeddingCache
+from services.executors import executors
 
 
 class NLPService:
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-    
+    def __init__(self, model_name: Optional[str] = None, revision: Optional[str] = None):
+        # Defaults to the configured model; a second instance serves a model migration (EMBEDDING_V2_*)
+        self.model_name = model_name or settings.EMBEDDING_MODEL_NAME
+        self.revision = settings.EMBEDDING_MODEL_REVISION if revision is None else revision
+        # The sidecar only serves the configured model
+        self.use_sidecar = model_name is None and bool(settings.EMBEDDING_SIDECAR_SOCKET)
+        # The backend (and torch / onnxruntime) is loaded on first use or by warm_up(), never at import
+        self._backend = None
+        self._cache = None
+        self._load_lock = threading.Lock()
+        self.warmed_up = False
+        self.max_batch_size = settings.EMBEDDING_BATCH_MAX_SIZE
+        self.max_wait = settings.EMBEDDING_BATCH_MAX_WAIT_MS / 1000
+        self._queue = None
+        self._worker = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._load_lock:
+                if self._backend is None:
+                    started = time.perf_counter()
+                    if self.use_sidecar:
+                        # Thin client: the model lives once per host in the sidecar
+                        self._backend = SidecarBackend(
+                            settings.EMBEDDING_SIDECAR_SOCKET, settings.EMBEDDING_SIDECAR_TIMEOUT_S
+                        )
+                    else:
+                        self._backend = create_backend(
+                            settings.EMBEDDING_BACKEND,
+                            self.model_name,
+                            settings.ONNX_MODEL_DIR,
+                            settings.ONNX_QUANTIZED,
+                            self.revision
+                        )
+                    print(
+                        f"✅ Embedding model {self.model_name} ({self._backend.name}) "
+                        f"loaded in {time.perf_counter() - started:.1f}s"
+                    )
+        return self._backend
+
+    @property
+    def model_id(self) -> str:
+        """Stored with each embedding as `embedding_model`"""
+        return f"{self.backend.model_name}@{self.backend.revision}"
+
+    @property
+    def cache(self) -> Optional[EmbeddingCache]:
+        if self._cache is None and settings.EMBEDDING_CACHE_PATH:
+            backend = self.backend
+            with self._load_lock:
+                if self._cache is None:
+                    self._cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, backend.model_name, backend.revision)
+        return self._cache
+
+    @property
+    def ready(self) -> bool:
+        return self.warmed_up
+
+    async def warm_up(self):
+        """Load the model, open the cache and run one encode off the event loop, so the first request is not slow"""
+        await executors.inference.run(self.generate_embedding, "warm up", admitted=True)
+        await executors.io.run(lambda: self.cache, admitted=True)
+        self.warmed_up = True
+
     def generate_embedding(self, text: str):
-        embedding = self.model.encode(text)
-        return embedding.tolist()
+        return self.generate_embeddings([text])[0]
+
+    def generate_embeddings(
+        self, texts: List[str], batch_size: Optional[int] = None, cached: bool = False
+    ) -> List[List[float]]:
+        """
+        Encode several texts in a single model call
+        With cached=True vectors are read from the persistent cache first and
+        the ones computed are added to it (document writes and bulk tools).
+        """
+        cache = self.cache if cached else None
+        if cache is None:
+            return self.backend.encode(texts, batch_size=batch_size or self.max_batch_size).tolist()
+
+        vectors = cache.get_many(texts)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            computed = self.backend.encode([texts[i] for i in missing], batch_size=batch_size or self.max_batch_size)
+            cache.put_many([texts[i] for i in missing], computed)
+            for i, vector in zip(missing, computed):
+                vectors[i] = vector
+        return [vector.tolist() for vector in vectors]
+
+    async def embed(self, text: str, cached: bool = False) -> List[float]:
+        """
+        Embed text without blocking the event loop
+        Concurrent callers are grouped into one encode() call by the micro-batcher.
+        cached=True goes through the persistent cache (document writes, not queries).
+        """
+        # Only once warm_up() opened it: loading the model here would block the event loop
+        cache = self._cache if cached else None
+        if cache is not None:
+            # SQLite may wait on another process's write lock: keep it off the event loop
+            vector = await executors.io.run(cache.get, text, admitted=True)
+            if vector is not None:
+                return vector.tolist()
+
+        embedding = await self._embed_batched(text)
+        if cache is not None:
+            await executors.io.run(cache.put_many, [text], [embedding], admitted=True)
+        return embedding
+
+    async def _embed_batched(self, text: str) -> List[float]:
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._batch_worker())
+        executors.inference.check(backlog=self._queue.qsize())
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    async def _batch_worker(self):
+        while True:
+            batch = [await self._queue.get()]
+
+            # Wait a few milliseconds for more requests unless the batch is already full
+            self._drain(batch)
+            if len(batch) < self.max_batch_size and self.max_wait > 0:
+                await asyncio.sleep(self.max_wait)
+                self._drain(batch)
+
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            try:
+                embeddings = await executors.inference.run(
+                    self.generate_embeddings, [text for text, _ in batch], admitted=True
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+
+    def cache_stats(self) -> Optional[dict]:
+        return self._cache.stats() if self._cache is not None else None
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _drain(self, batch: list):
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def close(self):
+        """Stop the micro-batcher, fail any request still waiting and close the cache"""
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+        self._worker = None
 
 
 nlp_service = NLPService()
+
+# The model being migrated to (content_embedding_v2), see services/embedding_migration.py
+nlp_service_v2 = (
+    NLPService(settings.EMBEDDING_V2_MODEL_NAME, settings.EMBEDDING_V2_MODEL_REVISION)
+    if settings.EMBEDDING_V2_MODEL_NAME else None
+)
@@ -0,0 +1,60 @@
+"""
+Keyset pagination over documents sorted by (upload_date, _id), newest first
+
+The cursor is the position of the last document on a page, encoded as an
+opaque URL-safe token. Each page is an index range scan starting right after
+it, so page 10,000 costs the same as page 1 (unlike skip/limit).
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+
+
+SORT_ORDER = [("upload_date", -1), ("_id", -1)]
+
+
+def encode_cursor(doc: dict) -> str:
+    upload_date = doc.get("upload_date")
+    position = {
+        "d": upload_date.isoformat() if upload_date else None,
+        "id": str(doc["_id"])
+    }
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict:
+    """Return the (upload_date, _id) position in a cursor; raises ValueError if malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return {
+            "upload_date": datetime.fromisoformat(position["d"]) if position["d"] else None,
+            "_id": ObjectId(position["id"])
+        }
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def after_cursor(position: dict) -> dict:
+    """Filter for the documents that sort after a position"""
+    upload_date = position["upload_date"]
+    same_date_later_id = {"upload_date": upload_date, "_id": {"$lt": position["_id"]}}
+    if upload_date is None:
+        # Undated documents sort last; only the _id tiebreak is left
+        return same_date_later_id
+    return {"$or": [
+        {"upload_date": {"$lt": upload_date}},
+        same_date_later_id,
+        # $lt never matches null, but undated documents still follow every dated one
+        {"upload_date": None}
+    ]}
+
+
+def page_query(query: dict, cursor: Optional[str]) -> dict:
+    if not cursor:
+        return query
+    position = after_cursor(decode_cursor(cursor))
+    return {"$and": [query, position]} if query else position
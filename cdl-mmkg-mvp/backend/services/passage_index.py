@@ -0,0 +1,157 @@
+"""
+Passage-level retrieval over the `chunks` collection
+
+Every document is split into overlapping passages whose embeddings are
+stored int8-quantized in `cdl_mvp.chunks` and indexed in-process. Chunk ids
+are "<document_id>:<chunk_index>", so all passages of a document sort next
+to each other and can be found with an anchored `_id` prefix match.
+"""
+import re
+from typing import List, Optional, Tuple
+
+from services.chunker import split_into_passages
+from services.executors import executors
+from services.nlp_service import nlp_service
+from services.vector_codec import decode_chunk_embedding, encode_int8
+from services.vector_index import VectorIndex
+
+
+PASSAGE_OVERSAMPLE = 8
+
+chunk_index = VectorIndex()
+
+
+def chunk_id(document_id: str, position: int) -> str:
+    return f"{document_id}:{position:04d}"
+
+
+def parent_id(chunk_key: str) -> str:
+    return chunk_key.split(":", 1)[0]
+
+
+def _document_chunks_filter(document_id: str) -> dict:
+    return {"_id": {"$regex": f"^{re.escape(document_id)}:"}}
+
+
+def build_chunk_documents(document_id, passages: List[str], embeddings) -> List[dict]:
+    """Shape passages and their embeddings as `chunks` documents"""
+    chunks = []
+    for position, (passage, embedding) in enumerate(zip(passages, embeddings)):
+        encoded = encode_int8(embedding)
+        chunks.append({
+            "_id": chunk_id(str(document_id), position),
+            "document_id": document_id,
+            "chunk_index": position,
+            "text": passage,
+            "embedding": encoded["vector"],
+            "embedding_scale": encoded["scale"],
+            "embedding_offset": encoded["offset"]
+        })
+    return chunks
+
+
+async def load_chunk_index(collection) -> int:
+    """Fallback for when no chunk snapshot exists: decode every chunk from MongoDB"""
+    return await chunk_index.load(
+        collection,
+        field="embedding",
+        projection={"_id": 1, "embedding": 1, "embedding_scale": 1, "embedding_offset": 1},
+        decode=decode_chunk_embedding
+    )
+
+
+async def index_passages(collection, document_id, content: str) -> int:
+    """(Re)build the passages of one document and index them"""
+    await remove_passages(collection, document_id)
+
+    passages = split_into_passages(content)
+    if not passages:
+        return 0
+
+    # Large documents yield hundreds of passages: encode them in batches off the event loop
+    embeddings = await executors.inference.run(nlp_service.generate_embeddings, passages, None, True, admitted=True)
+    return await store_passages(collection, document_id, passages, embeddings)
+
+
+async def store_passages(collection, document_id, passages: List[str], embeddings) -> int:
+    """Insert already-embedded passages of a new document and index them"""
+    if not passages:
+        return 0
+
+    chunks = build_chunk_documents(document_id, passages, embeddings)
+
+    await collection.insert_many(chunks, ordered=False)
+    for chunk, embedding in zip(chunks, embeddings):
+        chunk_index.upsert(chunk["_id"], embedding)
+    return len(chunks)
+
+
+async def copy_passages(collection, source_document_id, document_id) -> int:
+    """Give a duplicate document its own copy of an existing document's passages"""
+    chunks = []
+    async for chunk in collection.find(_document_chunks_filter(str(source_document_id))):
+        chunk["_id"] = chunk_id(str(document_id), chunk["chunk_index"])
+        chunk["document_id"] = document_id
+        chunks.append(chunk)
+    if not chunks:
+        return 0
+
+    await collection.insert_many(chunks, ordered=False)
+    for chunk in chunks:
+        chunk_index.upsert(chunk["_id"], decode_chunk_embedding(chunk))
+    return len(chunks)
+
+
+async def remove_passages(collection, document_id) -> int:
+    """Delete every passage that belongs to a document"""
+    query = _document_chunks_filter(str(document_id))
+    keys = [chunk["_id"] async for chunk in collection.find(query, {"_id": 1})]
+    if not keys:
+        return 0
+
+    await collection.delete_many(query)
+    for key in keys:
+        chunk_index.remove(key)
+    return len(keys)
+
+
+async def search_passages(
+    collection,
+    query_embedding,
+    limit: int,
+    document_ids: Optional[List[str]] = None
+) -> List[Tuple[str, float, str]]:
+    """
+    Rank documents by their best-matching passage (max-sim aggregation)
+    Returns (document_id, similarity, passage text), best first. With
+    `document_ids`, only passages of those documents are scored.
+    """
+    prefixes = None if document_ids is None else [f"{document_id}:" for document_id in document_ids]
+    best = {}
+    k = limit * PASSAGE_OVERSAMPLE
+    while True:
+        hits = chunk_index.search(query_embedding, k, prefixes)
+        best.clear()
+        for key, similarity in hits:
+            # Hits are sorted, so the first passage seen per document is its max
+            best.setdefault(parent_id(key), (key, similarity))
+            if len(best) == limit:
+                break
+        if len(best) >= limit or len(hits) < k:
+            break
+        # A few long documents filled the candidate list: widen it
+        k *= 4
+
+    if not best:
+        return []
+
+    cursor = collection.find(
+        {"_id": {"$in": [key for key, _ in best.values()]}},
+        {"_id": 1, "text": 1}
+    )
+    texts = {chunk["_id"]: chunk.get("text", "") async for chunk in cursor}
+
+    return [
+        (document_id, similarity, texts.get(key, ""))
+        for document_id, (key, similarity) in best.items()
+    ]
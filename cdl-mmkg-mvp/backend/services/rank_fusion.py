@@ -0,0 +1,31 @@
+"""
+Reciprocal rank fusion of several ranked result lists
+
+Each list contributes weight / (k + rank) to every document it contains, so
+lists with incomparable scores (cosine similarity, MongoDB textScore) can be
+merged by rank alone.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Tuple[float, Sequence[str]]],
+    k: int = 60
+) -> List[Tuple[str, float]]:
+    """
+    Fuse (weight, ranked ids) lists into (id, score) pairs, best first
+    Scores are scaled to 0-1, where 1 means ranked first by every list.
+    """
+    scores: Dict[str, float] = {}
+    for weight, ids in rankings:
+        if weight <= 0:
+            continue
+        for rank, doc_id in enumerate(ids, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+
+    best_possible = sum(weight for weight, _ in rankings if weight > 0) / (k + 1)
+    if not scores or not best_possible:
+        return []
+
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return [(doc_id, score / best_possible) for doc_id, score in fused]
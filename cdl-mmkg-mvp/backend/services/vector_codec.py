@@ -0,0 +1,101 @@
+"""
+Compact BSON encodings for embedding vectors
+
+Vectors are stored as BSON binary vectors (subtype 9). The payload is a
+dtype byte, a padding byte, then the packed little-endian values, so reads
+decode zero-copy with np.frombuffer.
+
+Document embeddings may be stored as a plain list of doubles (the original
+format), a float32 binary vector, or an int8 binary vector whose scale and
+offset live in sibling `<field>_scale` / `<field>_offset` fields.
+"""
+from typing import Optional
+
+import numpy as np
+from bson.binary import Binary
+
+
+VECTOR_SUBTYPE = 9
+DTYPE_INT8 = 0x03
+DTYPE_FLOAT32 = 0x27
+HEADER_SIZE = 2
+
+FORMAT_LIST = "list"
+FORMAT_FLOAT32 = "float32"
+FORMAT_INT8 = "int8"
+STORAGE_FORMATS = (FORMAT_LIST, FORMAT_FLOAT32, FORMAT_INT8)
+
+
+def encode_int8(vector) -> dict:
+    """Scalar-quantize a vector to int8 with a per-vector scale and offset"""
+    array = np.asarray(vector, dtype=np.float32).reshape(-1)
+    low, high = float(array.min()), float(array.max())
+    scale = (high - low) / 255 or 1.0
+    quantized = np.clip(np.round((array - low) / scale) - 128, -128, 127).astype(np.int8)
+    return {
+        "vector": Binary(bytes([DTYPE_INT8, 0]) + quantized.tobytes(), VECTOR_SUBTYPE),
+        "scale": scale,
+        "offset": low
+    }
+
+
+def decode_int8(data: bytes, scale: float, offset: float) -> np.ndarray:
+    quantized = np.frombuffer(data, dtype=np.int8, offset=HEADER_SIZE)
+    return (quantized.astype(np.float32) + 128) * scale + offset
+
+
+def encode_float32(vector) -> Binary:
+    array = np.asarray(vector, dtype="<f4").reshape(-1)
+    return Binary(bytes([DTYPE_FLOAT32, 0]) + array.tobytes(), VECTOR_SUBTYPE)
+
+
+def decode_float32(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<f4", offset=HEADER_SIZE)
+
+
+def embedding_format(value) -> Optional[str]:
+    """Storage format of a stored embedding value"""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        return FORMAT_INT8 if value[0] == DTYPE_INT8 else FORMAT_FLOAT32
+    return FORMAT_LIST
+
+
+def encode_embedding(vector, storage_format: str, field: str = "content_embedding") -> dict:
+    """Fields to store for an embedding in the given format"""
+    if storage_format == FORMAT_INT8:
+        encoded = encode_int8(vector)
+        return {
+            field: encoded["vector"],
+            f"{field}_scale": encoded["scale"],
+            f"{field}_offset": encoded["offset"]
+        }
+    if storage_format == FORMAT_FLOAT32:
+        return {field: encode_float32(vector)}
+    if storage_format == FORMAT_LIST:
+        return {field: np.asarray(vector, dtype=np.float64).tolist()}
+    raise ValueError(f"Unknown embedding storage format: {storage_format}")
+
+
+def embedding_projection(field: str = "content_embedding") -> dict:
+    """Projection that fetches an embedding in any storage format"""
+    return {field: 1, f"{field}_scale": 1, f"{field}_offset": 1}
+
+
+def decode_embedding(doc: dict, field: str = "content_embedding") -> Optional[np.ndarray]:
+    """Decode an embedding stored in any format into a float32 array"""
+    value = doc.get(field)
+    storage_format = embedding_format(value)
+    if storage_format is None:
+        return None
+    if storage_format == FORMAT_INT8:
+        return decode_int8(value, doc[f"{field}_scale"], doc[f"{field}_offset"])
+    if storage_format == FORMAT_FLOAT32:
+        return decode_float32(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def decode_chunk_embedding(chunk: dict) -> Optional[np.ndarray]:
+    """Decode the int8 embedding stored on a `chunks` document"""
+    return decode_embedding(chunk, "embedding")
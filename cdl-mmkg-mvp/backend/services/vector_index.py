@@ -0,0 +1,353 @@
+"""
+In-process vector index over document embeddings
+
+Used by the search fallback when the Atlas `$vectorSearch` stage is not
+available (e.g. self-hosted MongoDB). Vectors are kept L2-normalized so a
+query is a single matmul plus a partial sort.
+
+The index has two layers: a read-only base memory-mapped from the
+EmbeddingStore snapshot, and an in-memory delta for rows written since.
+Rows in the base that were updated or deleted are masked out.
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.embedding_store import EmbeddingStore, INT8_SCALE, OP_DELETE, OP_UPSERT
+from services.vector_codec import decode_embedding, embedding_projection
+
+
+EMBEDDING_DIM = 384
+SEARCH_BLOCK_ROWS = 65536
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the k highest scores, best first"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def normalize(vector) -> Optional[np.ndarray]:
+    """Convert an embedding to a unit-length float32 vector"""
+    array = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(array)
+    if not norm or not np.isfinite(norm):
+        return None
+    return array / norm
+
+
+def as_float32(block: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """Upcast stored rows (float32, float16 or int8 with per-row scales) to float32 unit vectors"""
+    if block.dtype == np.int8:
+        if scales is None:
+            return block.astype(np.float32) / INT8_SCALE
+        return block.astype(np.float32) * scales[:, None]
+    return block.astype(np.float32, copy=False)
+
+
+def score_matrix(matrix: np.ndarray, query: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """Dot every row against the query, upcasting compact dtypes block by block"""
+    if matrix.dtype == np.float32:
+        return matrix @ query
+    scores = np.empty(matrix.shape[0], dtype=np.float32)
+    for start in range(0, matrix.shape[0], SEARCH_BLOCK_ROWS):
+        block = matrix[start:start + SEARCH_BLOCK_ROWS]
+        block_scales = scales[start:start + SEARCH_BLOCK_ROWS] if scales is not None else None
+        scores[start:start + block.shape[0]] = as_float32(block, block_scales) @ query
+    return scores
+
+
+def rank_candidates(embeddings: List[Optional[np.ndarray]], query, k: int) -> List[Tuple[int, float]]:
+    """
+    Cosine-rank a list of candidate embeddings against a query in one matmul
+    Returns (position, similarity) pairs, best first. Candidates without a
+    usable embedding score 0.
+    """
+    query = normalize(query)
+    if query is None or not embeddings:
+        return []
+
+    matrix = np.zeros((len(embeddings), query.shape[0]), dtype=np.float32)
+    for row, embedding in enumerate(embeddings):
+        if embedding is not None and len(embedding) == query.shape[0]:
+            matrix[row] = embedding
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1.0
+
+    scores = (matrix @ query) / norms
+    return [(int(row), float(scores[row])) for row in top_k(scores, k)]
+
+
+def key_prefix(key: str) -> str:
+    """The document part of a key: "<document id>:" for passage keys, the key itself otherwise"""
+    document_id, separator, _ = key.partition(":")
+    return document_id + separator
+
+
+class VectorIndex:
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.store: Optional[EmbeddingStore] = None
+        self._reset_base()
+        self._reset_delta()
+
+    def _reset_base(self):
+        self._base_ids = np.empty(0, dtype="S32")
+        self._base_vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self._base_scales = None
+        self._base_live = np.zeros(0, dtype=bool)
+        self._base_dead = 0
+
+    def _reset_delta(self):
+        self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._base_ids) - self._base_dead + len(self._ids)
+
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self._rows or self._base_row(document_id) is not None
+
+    def _base_rows_scales(self, rows: np.ndarray) -> Optional[np.ndarray]:
+        return self._base_scales[rows] if self._base_scales is not None else None
+
+    def _base_row(self, document_id: str) -> Optional[int]:
+        if not len(self._base_ids):
+            return None
+        key = document_id.encode("ascii")
+        row = int(np.searchsorted(self._base_ids, key))
+        if row < len(self._base_ids) and self._base_ids[row] == key and self._base_live[row]:
+            return row
+        return None
+
+    def attach(self, store: EmbeddingStore, replay: bool = True) -> bool:
+        """Open the persisted snapshot and replay its journal"""
+        self.store = store
+        snapshot = store.open_snapshot()
+        if snapshot is None:
+            return False
+
+        self._reset_delta()
+        self._base_ids = snapshot.ids
+        self._base_vectors = snapshot.vectors
+        self._base_scales = snapshot.scales
+        self._base_live = np.ones(len(snapshot), dtype=bool)
+        self._base_dead = 0
+        if replay:
+            self._apply_journal(from_start=True)
+        return True
+
+    def sync(self):
+        """Pick up writes made by other workers (two stat calls when idle)"""
+        if self.store is None:
+            return
+        if self.store.snapshot_changed():
+            self.attach(self.store)
+        else:
+            self._apply_journal()
+
+    def _apply_journal(self, from_start: bool = False):
+        for op, document_id, vector in self.store.read_journal(from_start=from_start):
+            self.apply(op, document_id, vector)
+
+    def apply(self, op: bytes, document_id: str, vector: np.ndarray):
+        """Apply one journal record without journaling it again"""
+        if op == OP_UPSERT:
+            self._upsert(document_id, vector)
+        elif op == OP_DELETE:
+            self._remove(document_id)
+
+    async def load(
+        self,
+        collection,
+        field: str = "content_embedding",
+        batch_size: int = 10000,
+        projection: Optional[dict] = None,
+        decode: Optional[Callable[[dict], Optional[np.ndarray]]] = None
+    ):
+        """Build the index from every document that has an embedding"""
+        ids = []
+        vectors = []
+        cursor = collection.find(
+            {field: {"$exists": True, "$ne": None}},
+            projection or {"_id": 1, **embedding_projection(field)}
+        ).batch_size(batch_size)
+
+        async for doc in cursor:
+            embedding = decode(doc) if decode else decode_embedding(doc, field)
+            if embedding is None or len(embedding) != self.dim:
+                continue
+            ids.append(str(doc["_id"]))
+            vectors.append(embedding)
+
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+
+        self._reset_base()
+        self._vectors = matrix / norms
+        self._ids = ids
+        self._rows = {doc_id: row for row, doc_id in enumerate(ids)}
+        if self.store is not None:
+            # Mongo already reflects everything journaled so far
+            self.store.skip_journal()
+        return len(ids)
+
+    def upsert(self, document_id: str, embedding) -> bool:
+        """Insert or replace the vector stored for a document"""
+        vector = normalize(embedding)
+        if vector is None or vector.shape[0] != self.dim:
+            self.remove(document_id)
+            return False
+
+        self._upsert(document_id, vector)
+        if self.store is not None:
+            self.store.append(OP_UPSERT, document_id, vector)
+        return True
+
+    def remove(self, document_id: str) -> bool:
+        """Drop a document from the index"""
+        removed = self._remove(document_id)
+        if removed and self.store is not None:
+            self.store.append(OP_DELETE, document_id)
+        return removed
+
+    def _upsert(self, document_id: str, vector: np.ndarray):
+        base_row = self._base_row(document_id)
+        if base_row is not None:
+            self._base_live[base_row] = False
+            self._base_dead += 1
+
+        row = self._rows.get(document_id)
+        if row is not None:
+            self._vectors[row] = vector
+            return
+
+        row = len(self._ids)
+        if row >= self._vectors.shape[0]:
+            # Grow geometrically so appends stay amortized O(1)
+            capacity = max(1024, self._vectors.shape[0] * 2)
+            grown = np.zeros((capacity, self.dim), dtype=np.float32)
+            grown[:row] = self._vectors[:row]
+            self._vectors = grown
+
+        self._vectors[row] = vector
+        self._ids.append(document_id)
+        self._rows[document_id] = row
+
+    def _remove(self, document_id: str) -> bool:
+        removed = False
+        base_row = self._base_row(document_id)
+        if base_row is not None:
+            self._base_live[base_row] = False
+            self._base_dead += 1
+            removed = True
+
+        row = self._rows.pop(document_id, None)
+        if row is None:
+            return removed
+
+        # Swap-with-last keeps the delta contiguous, O(1)
+        last = len(self._ids) - 1
+        if row != last:
+            moved_id = self._ids[last]
+            self._vectors[row] = self._vectors[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._ids.pop()
+        return True
+
+    def _row_id(self, row: int) -> str:
+        base_size = len(self._base_ids)
+        if row < base_size:
+            return self._base_ids[row].decode("ascii")
+        return self._ids[row - base_size]
+
+    def prefix_rows(self, prefixes: Iterable[str]) -> np.ndarray:
+        """
+        Live rows whose key starts with any of the prefixes (a posting list)
+        Prefixes are document ids or "<document id>:" for passage keys. Base keys
+        are sorted, so each prefix is one contiguous range; delta keys are looked
+        up by their document part in a set.
+        """
+        prefixes = sorted(set(prefixes))
+        if not prefixes:
+            return np.empty(0, dtype=np.int64)
+
+        rows = []
+        if len(self._base_ids):
+            low_keys = np.array([prefix.encode("ascii") for prefix in prefixes], dtype=self._base_ids.dtype)
+            high_keys = np.array([prefix.encode("ascii") + b"\xff" for prefix in prefixes], dtype=self._base_ids.dtype)
+            lows = np.searchsorted(self._base_ids, low_keys)
+            lengths = np.searchsorted(self._base_ids, high_keys) - lows
+            # Expand the ranges without a Python loop: each row is its range start plus its offset in it
+            range_starts = np.cumsum(lengths) - lengths
+            base_rows = np.repeat(lows - range_starts, lengths) + np.arange(int(lengths.sum()))
+            rows.append(base_rows[self._base_live[base_rows]])
+
+        prefix_set = set(prefixes)
+        base_size = len(self._base_ids)
+        rows.append(np.array(
+            [base_size + row for row, key in enumerate(self._ids) if key_prefix(key) in prefix_set],
+            dtype=np.int64
+        ))
+        return np.concatenate(rows).astype(np.int64)
+
+    def search(self, query_embedding, k: int = 10, prefixes: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Return the k most similar documents as (id, cosine similarity) pairs
+        With `prefixes`, only keys starting with one of them are scored.
+        """
+        self.sync()
+        query = normalize(query_embedding)
+        if query is None or not len(self):
+            return []
+
+        if prefixes is not None:
+            return self._search_rows(query, k, self.prefix_rows(prefixes))
+
+        scores = score_matrix(self._base_vectors, query, self._base_scales)
+        if self._base_dead:
+            scores[~self._base_live] = -np.inf
+        if self._ids:
+            scores = np.concatenate([scores, self._vectors[:len(self._ids)] @ query])
+
+        k = min(k, len(self))
+        return [(self._row_id(row), float(scores[row])) for row in top_k(scores, k)]
+
+    def _search_rows(self, query: np.ndarray, k: int, rows: np.ndarray) -> List[Tuple[str, float]]:
+        """Score a subset of rows only, gathering them from the base and the delta"""
+        base_size = len(self._base_ids)
+        in_base = rows < base_size
+        scores = np.empty(rows.size, dtype=np.float32)
+        scores[in_base] = score_matrix(self._base_vectors[rows[in_base]], query, self._base_rows_scales(rows[in_base]))
+        scores[~in_base] = self._vectors[rows[~in_base] - base_size] @ query
+        return [(self._row_id(int(rows[i])), float(scores[i])) for i in top_k(scores, k)]
+
+    def iter_rows(self, batch_size: int = SEARCH_BLOCK_ROWS):
+        """Yield (keys, vectors) for every live row in ascending key order"""
+        base_rows = np.flatnonzero(self._base_live)
+        keys = np.concatenate([
+            self._base_ids[base_rows],
+            np.array(self._ids, dtype=self._base_ids.dtype)
+        ])
+        rows = np.concatenate([base_rows, len(self._base_ids) + np.arange(len(self._ids))])
+        order = rows[np.argsort(keys, kind="stable")]
+
+        base_size = len(self._base_ids)
+        for start in range(0, order.size, batch_size):
+            batch = order[start:start + batch_size]
+            vectors = np.empty((batch.size, self.dim), dtype=np.float32)
+            in_base = batch < base_size
+            vectors[in_base] = as_float32(self._base_vectors[batch[in_base]], self._base_rows_scales(batch[in_base]))
+            vectors[~in_base] = self._vectors[batch[~in_base] - base_size]
+            yield [self._row_id(row) for row in batch], vectors
+
+
+vector_index = VectorIndex()
@@ -0,0 +1,63 @@
+"""
+Tests for the content-addressed upload store: a file is unlinked only by
+the release that drops its last reference
+
+Run this from the backend directory: python -m pytest test_blob_store.py
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from services import blob_store
+from services.blob_store import acquire_blob, release_blob
+from services.executors import executors
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "UPLOAD_DIR", str(tmp_path))
+    yield tmp_path
+    executors.io.shutdown()
+
+
+def write_temp(directory, name="upload.tmp"):
+    path = directory / name
+    path.write_bytes(b"same bytes")
+    return str(path)
+
+
+def test_last_release_unlinks_file(upload_dir, fake_db):
+    db = fake_db
+
+    async def run():
+        first = await acquire_blob(db, write_temp(upload_dir), "abc", ".pdf", 10)
+        second = await acquire_blob(db, write_temp(upload_dir), "abc", ".pdf", 10)
+        assert first == second
+        await release_blob(db, "abc")
+        assert os.path.exists(first)
+        await release_blob(db, "abc")
+        assert not os.path.exists(first)
+
+    asyncio.run(run())
+
+
+def test_release_racing_an_acquire_keeps_the_new_copy(upload_dir, fake_db):
+    db = fake_db
+
+    async def run():
+        old = await acquire_blob(db, write_temp(upload_dir), "abc", ".pdf", 10)
+        # The count reaches zero, then a new upload takes a reference before
+        # the release tries to delete the record
+        await db.blobs.find_one_and_update({"_id": "abc"}, {"$inc": {"ref_count": -1}})
+        new = await acquire_blob(db, write_temp(upload_dir), "abc", ".pdf", 10)
+        assert await db.blobs.find_one_and_delete({"_id": "abc", "ref_count": {"$lte": 0}}) is None
+        assert new == old and os.path.exists(new)
+
+        # Record deleted first: a re-created record publishes under a new name
+        await release_blob(db, "abc")
+        recreated = await acquire_blob(db, write_temp(upload_dir), "abc", ".pdf", 10)
+        assert recreated != old and os.path.exists(recreated)
+
+    asyncio.run(run())
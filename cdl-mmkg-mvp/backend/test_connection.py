@@ -32,7 +32,7 @@ async def test_connection():
         print(f"✅ Ping successful: {result}")
         
         # Get collection
-        collection = database.client.cdl_mvp.documents
+        collection = database.documents
         
         # Count documents
         print("\n3. Counting documents...")
@@ -115,7 +115,7 @@ async def test_specific_document(doc_id: str):
     
     try:
         await database.connect()
-        collection = database.client.cdl_mvp.documents
+        collection = database.documents
         
         doc = await collection.find_one({"_id": ObjectId(doc_id)})
         
@@ -0,0 +1,93 @@
+"""
+Tests for the document write path: create and update must go all the way
+through embedding and passage indexing
+
+Run this from the backend directory: python -m pytest test_documents_api.py
+MongoDB (fake_mongo.py) and the model are replaced by in-memory fakes.
+"""
+
+import asyncio
+import zlib
+
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from api import documents
+from core.database import database
+from models.document import DocumentCreate, DocumentUpdate
+from services.executors import executors
+from services.nlp_service import NLPService, nlp_service
+from services.passage_index import chunk_index
+from services.vector_index import EMBEDDING_DIM
+
+
+def fake_vectors(texts, batch_size=None, cached=False):
+    # Deterministic per text, so different texts get different vectors
+    return [
+        np.random.default_rng(zlib.crc32(text.encode())).standard_normal(EMBEDDING_DIM).astype(np.float32).tolist()
+        for text in texts
+    ]
+
+
+@pytest.fixture
+def fake_backend(monkeypatch, fake_db):
+    monkeypatch.setattr(database, "db", fake_db)
+    monkeypatch.setattr(database, "documents", fake_db["documents"])
+    monkeypatch.setattr(NLPService, "model_id", property(lambda self: "fake@test"))
+    monkeypatch.setattr(nlp_service, "generate_embeddings", fake_vectors)
+
+    async def embed(text, cached=False):
+        return fake_vectors([text])[0]
+
+    monkeypatch.setattr(nlp_service, "embed", embed)
+    yield fake_db
+    executors.inference.shutdown()
+
+
+LONG_TEXT = " ".join(f"word{i}" for i in range(1000))
+
+
+def test_create_document_indexes_passages(fake_backend):
+    created = asyncio.run(documents.create_document(DocumentCreate(title="Long", content=LONG_TEXT)))
+
+    chunks = [chunk for chunk in fake_backend.chunks.docs.values() if chunk["_id"].startswith(created["_id"])]
+    assert len(chunks) > 1
+    assert all(chunk["_id"] in chunk_index for chunk in chunks)
+    assert fake_backend.documents.docs[ObjectId(created["_id"])]["embedding_model"] == "fake@test"
+
+
+def test_update_content_reindexes_passages(fake_backend):
+    created = asyncio.run(documents.create_document(DocumentCreate(title="Short", content="a short text")))
+    asyncio.run(documents.update_document(created["_id"], DocumentUpdate(content=LONG_TEXT)))
+
+    chunks = [chunk for chunk in fake_backend.chunks.docs.values() if chunk["_id"].startswith(created["_id"])]
+    assert len(chunks) > 1
+    assert all(chunk["text"] != "a short text" for chunk in chunks)
+
+
+def test_racing_create_of_same_text_becomes_a_duplicate(fake_backend, monkeypatch):
+    first = asyncio.run(documents.create_document(DocumentCreate(title="First", content="same text")))
+
+    # The second upload checked for a duplicate before the first was inserted
+    async def not_found_yet(db, **kwargs):
+        return None
+
+    monkeypatch.setattr(documents, "find_duplicate", not_found_yet)
+    second = asyncio.run(documents.create_document(DocumentCreate(title="Second", content="same text ")))
+
+    stored = fake_backend.documents.docs
+    primary, duplicate = stored[ObjectId(first["_id"])], stored[ObjectId(second["_id"])]
+    assert primary["content_primary"] is True
+    assert "content_primary" not in duplicate
+    assert duplicate["content_embedding"] == primary["content_embedding"]
+
+
+def test_content_update_gives_up_the_primary(fake_backend):
+    created = asyncio.run(documents.create_document(DocumentCreate(title="Doc", content="old text")))
+    asyncio.run(documents.update_document(created["_id"], DocumentUpdate(content="new text")))
+
+    assert "content_primary" not in fake_backend.documents.docs[ObjectId(created["_id"])]
+    # The old text can be stored as a primary again
+    again = asyncio.run(documents.create_document(DocumentCreate(title="Again", content="old text")))
+    assert fake_backend.documents.docs[ObjectId(again["_id"])]["content_primary"] is True
@@ -0,0 +1,91 @@
+"""
+Recall check for compact embedding snapshots: top-k results from int8 and
+float16 snapshots must match exact float32 search
+
+Run this from the backend directory: python -m pytest test_embedding_store.py
+"""
+
+import numpy as np
+import pytest
+
+from services.embedding_store import INT8_SCALE, EmbeddingStore
+from services.vector_index import VectorIndex, normalize, top_k
+
+
+DIM = 384
+ROWS = 5000
+QUERIES = 100
+K = 10
+
+
+def unit_rows(rng, count):
+    rows = rng.standard_normal((count, DIM)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
+
+
+def recall_at_k(index: VectorIndex, keys, vectors, queries) -> float:
+    hits = 0
+    for query in queries:
+        expected = {keys[row] for row in top_k(vectors @ query, K)}
+        hits += len(expected & {key for key, _ in index.search(query, K)})
+    return hits / (K * len(queries))
+
+
+@pytest.fixture
+def corpus():
+    rng = np.random.default_rng(7)
+    vectors = unit_rows(rng, ROWS)
+    # Queries near stored rows, as real searches land near relevant passages
+    queries = [normalize(vectors[row] + 0.8 * unit_rows(rng, 1)[0]) for row in rng.choice(ROWS, QUERIES)]
+    keys = [f"{row:08d}" for row in range(ROWS)]
+    return keys, vectors, queries
+
+
+@pytest.mark.parametrize("dtype, min_recall", [("float16", 0.99), ("int8", 0.95)])
+def test_snapshot_recall_against_float32(tmp_path, corpus, dtype, min_recall):
+    keys, vectors, queries = corpus
+    store = EmbeddingStore(str(tmp_path), dim=DIM, dtype=dtype)
+    writer = store.create_snapshot_writer()
+    writer.write(keys, vectors)
+    writer.commit()
+
+    index = VectorIndex(DIM)
+    assert index.attach(store)
+    assert recall_at_k(index, keys, vectors, queries) >= min_recall
+
+
+def test_int8_row_scales_use_the_full_range(tmp_path, corpus):
+    keys, vectors, _ = corpus
+    store = EmbeddingStore(str(tmp_path), dim=DIM, dtype="int8")
+    writer = store.create_snapshot_writer()
+    writer.write(keys, vectors)
+    writer.commit()
+
+    snapshot = store.open_snapshot()
+    assert np.abs(np.asarray(snapshot.vectors)).max(axis=1).min() == 127
+    restored = np.asarray(snapshot.vectors, dtype=np.float32) * np.asarray(snapshot.scales)[:, None]
+    # A fixed scale would round every component to a multiple of 1/127
+    fixed = np.round(vectors * INT8_SCALE) / INT8_SCALE
+    assert np.abs(restored - vectors).mean() < np.abs(fixed - vectors).mean() / 2
+
+
+def test_prefix_search_covers_snapshot_and_delta(tmp_path, corpus):
+    _, vectors, queries = corpus
+    documents = [f"{document:024x}" for document in range(50)]
+    keys = [f"{document}:{passage:04d}" for document in documents for passage in range(3)]
+    store = EmbeddingStore(str(tmp_path), dim=DIM, dtype="float16")
+    writer = store.create_snapshot_writer()
+    writer.write(keys, vectors[:len(keys)])
+    writer.commit()
+
+    index = VectorIndex(DIM)
+    assert index.attach(store)
+    # Passages added after the snapshot live in the in-memory delta
+    index.upsert(f"{documents[7]}:0003", vectors[len(keys)])
+    index.upsert(f"{documents[8]}:0003", vectors[len(keys) + 1])
+
+    hits = index.search(queries[0], 10, [f"{documents[7]}:", f"{documents[9]}:"])
+    assert sorted(key for key, _ in hits) == sorted(
+        [f"{documents[7]}:{passage:04d}" for passage in range(4)]
+        + [f"{documents[9]}:{passage:04d}" for passage in range(3)]
+    )
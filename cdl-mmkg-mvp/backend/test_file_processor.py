@@ -0,0 +1,38 @@
+"""
+Tests for parallel PDF extraction: pages come back in document order and
+only a bounded number of page ranges is extracted ahead of the consumer
+
+Run this from the backend directory: python -m pytest test_file_processor.py
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from services import file_processor
+
+
+def test_parallel_pages_are_ordered_and_bounded(monkeypatch):
+    submitted = []
+
+    class CountingPool(ThreadPoolExecutor):
+        def __init__(self, max_workers, mp_context=None):
+            super().__init__(max_workers)
+
+        def submit(self, fn, *args):
+            submitted.append(args[1])
+            return super().submit(fn, *args)
+
+    def extract_range(file_path, start, stop):
+        return [f"page {page}" for page in range(start, stop)]
+
+    monkeypatch.setattr(file_processor, "ProcessPoolExecutor", CountingPool)
+    monkeypatch.setattr(file_processor, "_extract_pdf_range", extract_range)
+
+    workers, page_count = 3, 40 * file_processor.PDF_PAGES_PER_TASK
+    pages = []
+    for page in file_processor._iter_pdf_pages_parallel("book.pdf", page_count, workers):
+        pages.append(page)
+        # Ranges submitted beyond the one being read: never more than the pool size
+        read_ranges = (len(pages) - 1) // file_processor.PDF_PAGES_PER_TASK + 1
+        assert len(submitted) - read_ranges <= workers
+
+    assert pages == [f"page {page}" for page in range(page_count)]
@@ -0,0 +1,92 @@
+"""
+Test script to keep API and tool imports fast
+Run this from the backend directory: python test_import_time.py [--budget SECONDS]
+
+Each module is imported in a fresh interpreter. The test fails if an import
+takes longer than the budget or pulls in torch / sentence-transformers / onnxruntime,
+which must only load when the model is first used.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).parent
+
+# The API entry point and the tools that never embed anything
+MODULES = [
+    "main",
+    "api.search",
+    "api.documents",
+    "migrate_embeddings",
+    "scripts.build_embedding_store",
+    "scripts.ensure_indexes",
+    "services.embedding_server",
+    "scripts.reembed"
+]
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "onnxruntime"]
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(f"{{elapsed:.3f}} {{','.join(heavy)}}")
+"""
+
+
+def measure(module: str):
+    """Import time in seconds and heavy modules loaded, in a clean interpreter"""
+    env = {**os.environ, "PYTHONPATH": str(BACKEND_DIR)}
+    # Settings only needs a URI to import; nothing connects
+    env.setdefault("MONGO_URI", "mongodb://localhost:27017")
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    elapsed, _, heavy = result.stdout.strip().splitlines()[-1].partition(" ")
+    return float(elapsed), [name for name in heavy.split(",") if name]
+
+
+def check_import_time(budget: float) -> bool:
+    """Import every module and check the budget"""
+    print("=" * 60)
+    print(f"Testing Import Time (budget {budget:.1f}s per module)")
+    print("=" * 60)
+
+    passed = True
+    for module in MODULES:
+        try:
+            elapsed, heavy = measure(module)
+        except Exception as e:
+            print(f"❌ {module}: import failed ({e})")
+            passed = False
+            continue
+
+        if heavy:
+            print(f"❌ {module}: {elapsed:.2f}s, loaded {', '.join(heavy)} at import")
+            passed = False
+        elif elapsed > budget:
+            print(f"❌ {module}: {elapsed:.2f}s, over budget")
+            passed = False
+        else:
+            print(f"✅ {module}: {elapsed:.2f}s")
+
+    print("\n" + "=" * 60)
+    print("✅ All imports within budget" if passed else "❌ Import budget exceeded")
+    print("=" * 60)
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that importing the API stays fast")
+    parser.add_argument("--budget", type=float, default=3.0, help="Seconds allowed per module import")
+    args = parser.parse_args()
+    sys.exit(0 if check_import_time(args.budget) else 1)
@@ -0,0 +1,112 @@
+"""
+Tests for ingestion job claiming: with several API workers resuming the
+same jobs, each job must be processed exactly once
+
+Run this from the backend directory: python -m pytest test_ingestion_queue.py
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from services import ingestion
+from services.ingestion import JOB_DONE, JOB_FAILED, JOB_PROCESSING, JOB_QUEUED, IngestionQueue
+
+
+def job(status, **fields):
+    return {"_id": ObjectId(), "status": status, "file_path": "x.txt", "document": {}, **fields}
+
+
+async def resume_on(workers, db, processed):
+    for worker in workers:
+        worker.start(db)
+
+        async def process(job, worker=worker):
+            processed.append((worker.worker_id, job["_id"]))
+            await worker._set_status(job["_id"], JOB_DONE)
+
+        worker._process = process
+        await worker.resume()
+    for worker in workers:
+        await asyncio.gather(*list(worker._tasks))
+        await worker.close()
+
+
+def test_each_job_runs_once_across_workers(fake_db):
+    now = datetime.utcnow()
+    jobs = [
+        job(JOB_QUEUED),
+        job(JOB_PROCESSING, lease_until=now - timedelta(seconds=1)),
+        job(JOB_PROCESSING, lease_until=None)
+    ]
+    asyncio.run(fake_db.ingest_jobs.insert_many(jobs))
+    processed = []
+
+    asyncio.run(resume_on([IngestionQueue(), IngestionQueue()], fake_db, processed))
+
+    assert sorted(job_id for _, job_id in processed) == sorted(job["_id"] for job in jobs)
+    assert all(job["status"] == JOB_DONE for job in fake_db.ingest_jobs.docs.values())
+
+
+def test_live_lease_is_not_recovered(fake_db):
+    running = job(JOB_PROCESSING, worker="other", lease_until=datetime.utcnow() + timedelta(minutes=5))
+    asyncio.run(fake_db.ingest_jobs.insert_one(running))
+    processed = []
+
+    asyncio.run(resume_on([IngestionQueue()], fake_db, processed))
+
+    assert processed == []
+    stored = fake_db.ingest_jobs.docs[running["_id"]]
+    assert stored["status"] == JOB_PROCESSING and stored["worker"] == "other"
+
+
+class FakeExtraction:
+    async def run(self, fn, *args, admitted=False):
+        if fn is ingestion.extract_file:
+            return {"content": "text", "content_hash": "hash"}
+        return {"embedding": [0.0], "embedding_model": "fake@test", "passages": [], "passage_embeddings": []}
+
+
+async def no_duplicate(db, **kwargs):
+    return None
+
+
+def process_failing_insert(monkeypatch, db, inserted: bool):
+    queue = IngestionQueue()
+    queue.start(db)
+    running = job(JOB_PROCESSING, worker=queue.worker_id, document={"metadata": {"file_sha256": "abc"}})
+    asyncio.run(db.ingest_jobs.insert_one(running))
+    released = []
+
+    async def insert_document(db, document_dict, *args):
+        if inserted:
+            await db.documents.insert_one(document_dict)
+        raise RuntimeError("passage indexing failed")
+
+    async def release_blob(db, file_sha256):
+        released.append(file_sha256)
+
+    monkeypatch.setattr(ingestion.executors, "extraction", FakeExtraction())
+    monkeypatch.setattr(ingestion, "find_duplicate", no_duplicate)
+    monkeypatch.setattr(ingestion, "insert_document", insert_document)
+    monkeypatch.setattr(ingestion, "release_blob", release_blob)
+
+    asyncio.run(queue._process(running))
+    stored = db.ingest_jobs.docs[running["_id"]]
+    assert stored["status"] == JOB_FAILED
+    return stored, released
+
+
+def test_failure_after_insert_keeps_the_file(monkeypatch, fake_db):
+    running, released = process_failing_insert(monkeypatch, fake_db, inserted=True)
+
+    assert released == []
+    assert running["document_id"] is not None
+
+
+def test_failure_before_insert_releases_the_file(monkeypatch, fake_db):
+    running, released = process_failing_insert(monkeypatch, fake_db, inserted=False)
+
+    assert released == ["abc"]
+    assert running["document_id"] is None
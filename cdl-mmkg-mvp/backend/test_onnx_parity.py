@@ -0,0 +1,67 @@
+"""
+Test script to check the ONNX embedding backend against PyTorch
+Run this from the backend directory after scripts/export_onnx_model.py:
+
+    python test_onnx_parity.py [--float32] [--threshold 0.99]
+
+Encodes the same texts with both backends and fails if any pair of vectors
+has a cosine similarity below the threshold, so switching
+EMBEDDING_BACKEND=onnx keeps stored embeddings and queries comparable.
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from core.config import settings
+from services.embedding_backends import OnnxBackend, SentenceTransformerBackend, onnx_model_dir
+
+
+TEXTS = [
+    "Machine learning",
+    "Graph neural networks for knowledge graph completion",
+    "A survey of transformer architectures in natural language processing",
+    "The mitochondria is the powerhouse of the cell.",
+    "Deep reinforcement learning agents learn to play Atari games from raw pixels, "
+    "using convolutional networks to approximate the action-value function.",
+    "Ünïcödé text, numbers 12345 and punctuation!?",
+    "short",
+    " ".join(["Long documents are truncated to the model's maximum sequence length."] * 40)
+]
+
+
+def check_onnx_parity(quantized: bool, threshold: float) -> bool:
+    print("=" * 60)
+    print(f"Testing ONNX Parity ({'int8' if quantized else 'float32'} vs PyTorch, cosine >= {threshold})")
+    print("=" * 60)
+
+    reference = SentenceTransformerBackend(settings.EMBEDDING_MODEL_NAME).encode(TEXTS)
+    onnx = OnnxBackend(onnx_model_dir(settings.ONNX_MODEL_DIR, settings.EMBEDDING_MODEL_NAME), quantized=quantized)
+    candidate = onnx.encode(TEXTS)
+
+    if candidate.shape != reference.shape:
+        print(f"❌ Shape mismatch: {candidate.shape} vs {reference.shape}")
+        return False
+
+    cosines = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    for text, cosine in zip(TEXTS, cosines):
+        mark = "✅" if cosine >= threshold else "❌"
+        print(f"{mark} {cosine:.4f}  {text[:50]!r}")
+
+    passed = bool(cosines.min() >= threshold)
+    print("\n" + "=" * 60)
+    print(f"min {cosines.min():.4f}, mean {cosines.mean():.4f}")
+    print("✅ ONNX backend matches PyTorch" if passed else "❌ ONNX backend drifts from PyTorch")
+    print("=" * 60)
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare ONNX and PyTorch embeddings")
+    parser.add_argument("--float32", action="store_true", help="Check model.onnx instead of the int8 model")
+    parser.add_argument("--threshold", type=float, default=0.99, help="Minimum cosine similarity per text")
+    args = parser.parse_args()
+    sys.exit(0 if check_onnx_parity(not args.float32, args.threshold) else 1)
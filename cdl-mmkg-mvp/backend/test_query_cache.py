@@ -0,0 +1,37 @@
+"""
+Tests for the query-embedding cache: the model sees the query as typed, and
+case is folded into the cache key only for uncased models
+
+Run this from the backend directory: python -m pytest test_query_cache.py
+"""
+
+import asyncio
+
+from services.cache import QueryEmbeddingCache
+
+
+def embed_calls(cache: QueryEmbeddingCache, queries):
+    seen = []
+
+    async def compute(query):
+        seen.append(query)
+        return [float(len(seen))]
+
+    async def run():
+        return [await cache.get_or_compute(query, compute) for query in queries]
+
+    return seen, asyncio.run(run())
+
+
+def test_cased_model_keeps_query_case():
+    seen, vectors = embed_calls(QueryEmbeddingCache(16, uncased=False), ["Apple  pie", "apple pie", "Apple pie"])
+
+    assert seen == ["Apple  pie", "apple pie"]
+    assert vectors[2] == vectors[0]
+
+
+def test_uncased_model_shares_entry_and_embeds_original_text():
+    seen, vectors = embed_calls(QueryEmbeddingCache(16), ["Apple Pie", "apple  pie"])
+
+    assert seen == ["Apple Pie"]
+    assert vectors[0] == vectors[1]
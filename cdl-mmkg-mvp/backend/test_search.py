@@ -26,7 +26,7 @@ async def test_search():
         await database.connect()
         print("✅ Database connected successfully")
         
-        collection = database.client.cdl_mvp.documents
+        collection = database.documents
         
         # Count documents
         count = await collection.count_documents({})
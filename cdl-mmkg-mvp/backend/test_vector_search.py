@@ -0,0 +1,69 @@
+"""
+Tests for the semantic side of /search: passage hits are merged with the
+document-level ranking, and broad filters are applied after ranking
+
+Run this from the backend directory: python -m pytest test_vector_search.py
+MongoDB (fake_mongo.py) is replaced by an in-memory fake without Atlas, so
+document-level results come from the local vector index.
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from api import search
+from core.config import settings
+from core.database import database
+from services import passage_index
+from services.passage_index import build_chunk_documents
+from services.vector_index import EMBEDDING_DIM, VectorIndex
+
+
+def axis(position: int) -> np.ndarray:
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    vector[position] = 1.0
+    return vector
+
+
+@pytest.fixture
+def library(monkeypatch, fake_db):
+    """An unchunked document matching the query, and a chunked one matching it through a passage"""
+    documents = fake_db[settings.COLLECTION_NAME]
+    monkeypatch.setattr(database, "search_db", fake_db)
+
+    vector_index, chunk_index = VectorIndex(), VectorIndex()
+    monkeypatch.setattr(search, "vector_index", vector_index)
+    monkeypatch.setattr(search, "chunk_index", chunk_index)
+    monkeypatch.setattr(passage_index, "chunk_index", chunk_index)
+
+    unchunked, chunked = ObjectId(), ObjectId()
+    documents.docs[unchunked] = {"_id": unchunked, "title": "Unchunked", "content": "whole text", "metadata": {"file_type": ".pdf"}}
+    documents.docs[chunked] = {"_id": chunked, "title": "Chunked", "content": "long text", "metadata": {"file_type": ".txt"}}
+    vector_index.upsert(str(unchunked), axis(0))
+    vector_index.upsert(str(chunked), axis(1))
+
+    passage = axis(0) + 0.5 * axis(1)
+    for chunk in build_chunk_documents(chunked, ["matching passage"], [passage]):
+        fake_db.chunks.docs[chunk["_id"]] = chunk
+        chunk_index.upsert(chunk["_id"], passage)
+    return documents, str(unchunked), str(chunked)
+
+
+def test_documents_without_passages_still_rank(library):
+    documents, unchunked, chunked = library
+    results = asyncio.run(search.vector_search(documents, axis(0).tolist(), 10))
+
+    assert [result["_id"] for result in results] == [unchunked, chunked]
+    # The chunked document keeps its passage score and snippet, not its weaker document vector
+    assert results[1]["content"] == "matching passage"
+    assert results[1]["score"] > 0.9
+
+
+def test_broad_filter_is_applied_after_ranking(library, monkeypatch):
+    documents, unchunked, _ = library
+    monkeypatch.setattr(settings, "SEARCH_FILTER_MAX_IDS", 0)
+    results = asyncio.run(search.vector_search(documents, axis(0).tolist(), 10, {"metadata.file_type": {"$in": [".pdf"]}}))
+
+    assert [result["_id"] for result in results] == [unchunked]
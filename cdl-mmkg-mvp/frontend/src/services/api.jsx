@@ -56,6 +56,11 @@ export const createDocument = async (documentData) => {
   }
 };
 
+const JOB_POLL_INTERVAL_MS = 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Uploads are ingested in the background: poll the job until the document exists
 export const uploadDocument = async (formData) => {
   try {
     const response = await axios.post(`${API_BASE_URL}/documents/upload`, formData, {
@@ -63,10 +68,20 @@ export const uploadDocument = async (formData) => {
         'Content-Type': 'multipart/form-data',
       },
     });
-    return response.data;
+
+    let job = response.data;
+    while (job.status === 'queued' || job.status === 'processing') {
+      await sleep(JOB_POLL_INTERVAL_MS);
+      job = (await api.get(`/documents/jobs/${job._id}`)).data;
+    }
+
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Failed to process document');
+    }
+    return await getDocument(job.document_id);
   } catch (error) {
     console.error('Upload document error:', error);
-    throw new Error(error.response?.data?.detail || 'Failed to upload document');
+    throw new Error(error.response?.data?.detail || error.message || 'Failed to upload document');
   }
 };
 